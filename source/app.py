@@ -5,14 +5,18 @@
 """
 
 import base64
+import hashlib
 import io
 import json
 import os
 import re
+import struct
 import zipfile
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
+from pathlib import Path
 from typing import Callable, Optional
 
 import streamlit as st
@@ -20,8 +24,6 @@ import streamlit as st
 # 文件处理导入（延迟导入优化）
 try:
     from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-    from cryptography.hazmat.primitives import hashes
     from docx import Document
     import pdfplumber
 except ImportError as exc:
@@ -89,6 +91,18 @@ class EncryptionResult:
     original_length: int
     masked_keywords: list[str]
 
+    def to_dict(self) -> dict:
+        """用字典字面量构建，避免 dataclasses.asdict 的递归深拷贝"""
+        return {
+            "salt": self.salt,
+            "nonce": self.nonce,
+            "data": self.data,
+            "created_at": self.created_at,
+            "version": self.version,
+            "original_length": self.original_length,
+            "masked_keywords": self.masked_keywords,
+        }
+
 
 # ============= 预定义脱敏模式 =============
 
@@ -138,66 +152,121 @@ PREDEFINED_PATTERNS = {
 
 # ============= 核心脱敏功能 =============
 
+# 关键词分隔符：模块级预编译，连续分隔符一次吞掉，少产生空项
+_KW_SPLIT = re.compile(r"[\n\r,;，；]+")
+
+
 def normalize_keywords(raw: str) -> list[str]:
     """解析关键词列表，支持换行、逗号、分号分隔"""
     if not raw:
         return []
-    return [item.strip() for item in re.split(r"[\n,;，；]", raw) if item.strip()]
+    return [item for item in (piece.strip() for piece in _KW_SPLIT.split(raw)) if item]
 
 
 def mask_text_full(text: str, keyword: str, mask_char: str = "*") -> str:
-    """全量替换模式"""
-    escaped = re.escape(keyword)
-    return re.sub(escaped, mask_char * len(keyword), text)
+    """全量替换模式
 
+    关键词是字面量，str.replace 的 C 实现比 re.sub(re.escape(...)) 快得多。
+    """
+    return text.replace(keyword, mask_char * len(keyword))
 
-def mask_text_partial(text: str, keyword: str, preserve_chars: int = 1, mask_char: str = "*") -> str:
-    """部分遮蔽模式：保留前N位，其余用*替换"""
-    escaped = re.escape(keyword)
 
-    def replacement(match):
-        original = match.group(0)
-        if len(original) <= preserve_chars:
-            return original
-        return original[:preserve_chars] + mask_char * (len(original) - preserve_chars)
+def mask_text_full_multi(text: str, keywords: list[str], mask_char: str = "*") -> str:
+    """多关键词全量替换
 
-    return re.sub(escaped, replacement, text)
+    把所有关键词合并成一个交替正则后单次扫描，避免逐个关键词
+    各走一遍全文（O(N×K) → O(N)）。长关键词排在前面，保证不被
+    短关键词先吃掉子串。
+    """
+    if not keywords:
+        return text
+    combined = re.compile(
+        "|".join(re.escape(word) for word in sorted(keywords, key=len, reverse=True))
+    )
+    return combined.sub(lambda m: mask_char * len(m.group(0)), text)
+
+
+def mask_text_partial(text: str, keyword: str, preserve_chars: int = 1, mask_char: str = "*") -> str:
+    """部分遮蔽模式：保留前N位，其余用*替换"""
+    if len(keyword) <= preserve_chars:
+        return text
+    # 字面量关键词的替换串固定，同样走 str.replace 快路径
+    replacement = keyword[:preserve_chars] + mask_char * (len(keyword) - preserve_chars)
+    return text.replace(keyword, replacement)
 
 
 def mask_text_regex(text: str, pattern: str, preserve_chars: int = 0, mask_char: str = "*") -> tuple[str, int]:
-    """正则匹配模式"""
-    match_count = 0
+    """正则匹配模式
 
-    def replacement(match):
-        nonlocal match_count
+    用 finditer 收集片段后一次 join 拼接：re.sub 回调方式
+    每个匹配都要回调 Python 函数并反复拼接结果串，长文本下开销明显。
+    """
+    parts = []
+    pos = 0
+    match_count = 0
+    for match in re.finditer(pattern, text):
         match_count += 1
         original = match.group(0)
+        parts.append(text[pos:match.start()])
         if len(original) <= preserve_chars:
-            return original
-        return original[:preserve_chars] + mask_char * (len(original) - preserve_chars)
-
-    masked = re.sub(pattern, replacement, text)
-    return masked, match_count
+            parts.append(original)
+        else:
+            parts.append(
+                original[:preserve_chars] + mask_char * (len(original) - preserve_chars)
+            )
+        pos = match.end()
+    if not parts:
+        return text, 0
+    parts.append(text[pos:])
+    return "".join(parts), match_count
+
+
+# 智能识别的全部模式在模块加载时融合为一个命名分组的交替正则，
+# 整篇文本只扫描一遍，而不是每个模式各扫一遍
+_SMART_GROUPS = {
+    f"g{i}": pattern
+    for i, pattern in enumerate(PREDEFINED_PATTERNS.values())
+}
+_SMART_UNION = re.compile("|".join(
+    f"(?P<{group}>{pattern.pattern})"
+    for group, pattern in _SMART_GROUPS.items()
+))
 
 
 def apply_smart_detection(text: str) -> tuple[str, dict[str, int]]:
-    """智能识别常见敏感信息并脱敏"""
-    stats = {}
-    result = text
-
-    for name, pattern in PREDEFINED_PATTERNS.items():
-        result, count = mask_text_regex(
-            result,
-            pattern.pattern,
-            pattern.preserve_chars,
-            pattern.mask_char
-        )
-        if count > 0:
-            stats[name] = count
+    """智能识别常见敏感信息并脱敏（所有模式单遍扫描）"""
+    stats: dict[str, int] = {}
+    parts = []
+    pos = 0
+
+    for match in _SMART_UNION.finditer(text):
+        group = match.lastgroup
+        if group not in _SMART_GROUPS:
+            # 模式内部含未命名分组时 lastgroup 不可靠，逐分组探测
+            group = next(
+                name for name in _SMART_GROUPS if match.group(name) is not None
+            )
+        pattern = _SMART_GROUPS[group]
+        original = match.group(0)
 
-    return result, stats
+        parts.append(text[pos:match.start()])
+        if len(original) <= pattern.preserve_chars:
+            parts.append(original)
+        else:
+            parts.append(
+                original[:pattern.preserve_chars]
+                + pattern.mask_char * (len(original) - pattern.preserve_chars)
+            )
+        pos = match.end()
+        stats[pattern.name] = stats.get(pattern.name, 0) + 1
+
+    if not parts:
+        return text, stats
+    parts.append(text[pos:])
+    return "".join(parts), stats
 
 
+@st.cache_data(show_spinner=False, max_entries=32)
 def build_masked_text(
     text: str,
     keywords: list[str],
@@ -206,17 +275,21 @@ def build_masked_text(
     mask_char: str = "*",
     enable_smart: bool = False
 ) -> tuple[str, dict]:
-    """构建脱敏文本"""
+    """构建脱敏文本
+
+    纯函数，输入不变则结果不变；用 st.cache_data 记忆化，
+    页面因控件变化重跑脚本时不再重新脱敏。
+    """
     masked = text
     stats = {"manual_keywords": len(keywords), "smart_detection": {}}
 
-    # 应用手动关键词脱敏
+    # 应用手动关键词脱敏（长关键词先替换，避免被短关键词先吃掉子串）
     if keywords:
+        ordered = sorted(keywords, key=len, reverse=True)
         if mask_mode == MaskMode.FULL:
-            for word in keywords:
-                masked = mask_text_full(masked, word, mask_char)
+            masked = mask_text_full_multi(masked, ordered, mask_char)
         elif mask_mode == MaskMode.PARTIAL:
-            for word in keywords:
+            for word in ordered:
                 masked = mask_text_partial(masked, word, preserve_chars, mask_char)
 
     # 应用智能识别
@@ -229,29 +302,87 @@ def build_masked_text(
 
 # ============= 加密解密功能 =============
 
-def derive_key(password: str, salt: bytes) -> bytes:
-    """从密码派生加密密钥"""
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=Config.KEY_LENGTH,
-        salt=salt,
-        iterations=Config.PBKDF2_ITERATIONS,
+def derive_key(password: str, salt: bytes, kdf: str = "pbkdf2", kdf_params: dict = None) -> bytes:
+    """从密码派生加密密钥
+
+    hashlib 的 KDF 直接走 OpenSSL 绑定且在计算期间释放 GIL，
+    多线程同时派生密钥时能真正并行。本应用加密固定用 PBKDF2，
+    但还原时需要按载荷里的 kdf 元数据派生，以便解开桌面端
+    （scrypt）产出的还原文件。
+    """
+    if kdf == "scrypt":
+        params = kdf_params or {"n": 2 ** 15, "r": 8, "p": 1}
+        return hashlib.scrypt(
+            password.encode("utf-8"),
+            salt=salt,
+            n=params["n"],
+            r=params["r"],
+            p=params["p"],
+            # OpenSSL 默认内存上限约 32MB，恰好卡在 n=2^15 的用量上，放宽一倍
+            maxmem=256 * params["n"] * params["r"] * params["p"],
+            dklen=Config.KEY_LENGTH,
+        )
+
+    if kdf == "pbkdf2":
+        params = kdf_params or {"iterations": Config.PBKDF2_ITERATIONS}
+        return hashlib.pbkdf2_hmac(
+            "sha256",
+            password.encode("utf-8"),
+            salt,
+            params["iterations"],
+            dklen=Config.KEY_LENGTH,
+        )
+
+    raise ValueError(f"不支持的 KDF 算法：{kdf}")
+
+
+# 进程级 KDF 缓存（非 Streamlit 运行时的兜底）
+_KDF_CACHE: dict = {}
+
+
+def _derive_key_cached(password: str, salt: bytes, kdf: str = "pbkdf2", kdf_params: dict = None) -> bytes:
+    """派生密钥（带缓存）
+
+    KDF 是加解密路径的主要开销（PBKDF2 要跑 12 万轮 SHA-256）。
+    同一会话内用相同密码处理多个文件时，以 (密码摘要, 盐值, KDF
+    及其参数) 为键缓存派生结果，避免重复派生。缓存键只存密码的
+    SHA-256 摘要，不保留明文密码。
+    """
+    if st.runtime.exists():
+        cache = st.session_state.setdefault("_kdf_cache", {})
+    else:
+        cache = _KDF_CACHE
+
+    cache_key = (
+        hashlib.sha256(password.encode("utf-8")).digest(),
+        salt,
+        kdf,
+        tuple(sorted(kdf_params.items())) if kdf_params else None,
     )
-    return kdf.derive(password.encode("utf-8"))
+    key = cache.get(cache_key)
+    if key is None:
+        key = cache[cache_key] = derive_key(password, salt, kdf, kdf_params)
+    return key
+
+
+@lru_cache(maxsize=8)
+def _get_aesgcm(key: bytes) -> AESGCM:
+    """按密钥缓存 AESGCM 对象：同一密钥反复加解密时省去 AES 密钥扩展"""
+    return AESGCM(key)
 
 
 def encrypt_text(text: str, password: str, keywords: list[str]) -> EncryptionResult:
     """加密原文并保存元数据"""
     salt = os.urandom(Config.SALT_LENGTH)
-    key = derive_key(password, salt)
-    aesgcm = AESGCM(key)
+    key = _derive_key_cached(password, salt)
+    aesgcm = _get_aesgcm(key)
     nonce = os.urandom(Config.NONCE_LENGTH)
     data = aesgcm.encrypt(nonce, text.encode("utf-8"), None)
 
     return EncryptionResult(
-        salt=base64.b64encode(salt).decode("utf-8"),
-        nonce=base64.b64encode(nonce).decode("utf-8"),
-        data=base64.b64encode(data).decode("utf-8"),
+        salt=base64.b64encode(salt).decode("ascii"),
+        nonce=base64.b64encode(nonce).decode("ascii"),
+        data=base64.b64encode(data).decode("ascii"),
         created_at=datetime.now().isoformat(timespec="seconds"),
         version="2.0",
         original_length=len(text),
@@ -260,19 +391,95 @@ def encrypt_text(text: str, password: str, keywords: list[str]) -> EncryptionRes
 
 
 def decrypt_text(payload: dict, password: str) -> str:
-    """解密还原原文"""
+    """解密还原原文
+
+    载荷缺省按 PBKDF2 派生（本应用及旧版 JSON 文件的格式），
+    带 kdf 元数据时按元数据派生，兼容桌面端产出的还原文件。
+    """
     try:
         salt = base64.b64decode(payload["salt"])
         nonce = base64.b64decode(payload["nonce"])
         data = base64.b64decode(payload["data"])
-        key = derive_key(password, salt)
-        aesgcm = AESGCM(key)
+        key = _derive_key_cached(
+            password, salt,
+            kdf=payload.get("kdf") or "pbkdf2",
+            kdf_params=payload.get("kdf_params"),
+        )
+        aesgcm = _get_aesgcm(key)
         plain = aesgcm.decrypt(nonce, data, None)
         return plain.decode("utf-8")
     except (KeyError, ValueError) as e:
         raise ValueError("加密文件格式错误或已损坏") from e
 
 
+# 二进制还原容器：magic(4) | version(u16) | salt_len(u8) | salt |
+# nonce_len(u8) | nonce | header_len(u32) | header_json | ciphertext
+# 与 core.encryption 的 pack_result 格式完全一致，Web 端和桌面端
+# 产出的 restore_*.bin 可以互相还原；盐值/Nonce/密文直接存原始
+# 字节，省掉 base64 带来的 33% 体积和编解码开销
+_PACK_MAGIC = b"LDAR"
+_PACK_VERSION = 1
+
+
+def serialize_binary(encrypted_dict: dict) -> bytes:
+    """把加密载荷打包为二进制还原容器（LDAR 格式）"""
+    salt = base64.b64decode(encrypted_dict["salt"])
+    nonce = base64.b64decode(encrypted_dict["nonce"])
+    data = base64.b64decode(encrypted_dict["data"])
+    header = json.dumps({
+        "created_at": encrypted_dict.get("created_at"),
+        "version": encrypted_dict.get("version"),
+        "original_length": encrypted_dict.get("original_length"),
+        "masked_keywords": encrypted_dict.get("masked_keywords"),
+        "kdf": "pbkdf2",
+        "kdf_params": {"iterations": Config.PBKDF2_ITERATIONS},
+    }, ensure_ascii=False).encode("utf-8")
+
+    return b"".join([
+        _PACK_MAGIC,
+        struct.pack("<H", _PACK_VERSION),
+        struct.pack("<B", len(salt)), salt,
+        struct.pack("<B", len(nonce)), nonce,
+        struct.pack("<I", len(header)), header,
+        data,
+    ])
+
+
+def deserialize_binary(buf: bytes) -> dict:
+    """解析二进制还原容器，返回 decrypt_text 可直接消费的字典"""
+    try:
+        if buf[:4] != _PACK_MAGIC:
+            raise ValueError("缺少格式标识")
+        offset = 4
+        (container_version,) = struct.unpack_from("<H", buf, offset)
+        if container_version != _PACK_VERSION:
+            raise ValueError(f"不支持的还原文件版本：{container_version}")
+        offset += 2
+        salt_len = buf[offset]
+        offset += 1
+        salt = buf[offset:offset + salt_len]
+        offset += salt_len
+        nonce_len = buf[offset]
+        offset += 1
+        nonce = buf[offset:offset + nonce_len]
+        offset += nonce_len
+        (header_len,) = struct.unpack_from("<I", buf, offset)
+        offset += 4
+        meta = json.loads(buf[offset:offset + header_len])
+        offset += header_len
+        if len(salt) != salt_len or len(nonce) != nonce_len:
+            raise ValueError("长度不匹配")
+        data = buf[offset:]
+    except (struct.error, IndexError, ValueError) as e:
+        raise ValueError("加密文件格式错误或已损坏") from e
+    return {
+        **meta,
+        "salt": base64.b64encode(salt).decode("ascii"),
+        "nonce": base64.b64encode(nonce).decode("ascii"),
+        "data": base64.b64encode(data).decode("ascii"),
+    }
+
+
 # ============= 文件处理功能 =============
 
 def load_docx_text(file_obj) -> str:
@@ -297,31 +504,51 @@ def load_pdf_text(file_obj) -> str:
         raise ValueError(f"PDF 文件解析失败：{str(e)}") from e
 
 
-def extract_file_text(file_obj) -> str:
-    """从各种文件格式提取文本"""
-    name = file_obj.name.lower()
-
-    # 检查文件大小
+def _file_size(file_obj) -> int:
+    """获取文件大小（优先零拷贝路径，避免 seek/tell 往返）"""
+    size = getattr(file_obj, "size", None)  # Streamlit UploadedFile 直接暴露 size
+    if size is not None:
+        return size
+    if hasattr(file_obj, "getbuffer"):  # BytesIO 及其子类
+        return file_obj.getbuffer().nbytes
+    try:
+        # 真实文件走 fstat，避免 seek 把溢写到磁盘的临时文件整个拉回内存
+        return os.fstat(file_obj.fileno()).st_size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        pass
     file_obj.seek(0, os.SEEK_END)
-    size_mb = file_obj.tell() / (1024 * 1024)
+    size = file_obj.tell()
     file_obj.seek(0)
+    return size
 
-    if size_mb > Config.MAX_FILE_SIZE_MB:
-        raise ValueError(f"文件过大（{size_mb:.1f}MB），最大支持 {Config.MAX_FILE_SIZE_MB}MB")
 
+@st.cache_data(show_spinner=False, max_entries=16)
+def _extract_text_cached(name: str, raw: bytes) -> str:
+    """按文件内容缓存的文本提取（重跑脚本时同一文件不再重复解析）"""
     try:
         if name.endswith(".txt"):
-            return file_obj.read().decode("utf-8", errors="ignore")
+            return raw.decode("utf-8", errors="ignore")
         elif name.endswith(".docx"):
-            return load_docx_text(file_obj)
+            return load_docx_text(io.BytesIO(raw))
         elif name.endswith(".pdf"):
-            return load_pdf_text(file_obj)
+            return load_pdf_text(io.BytesIO(raw))
         else:
             raise ValueError("不支持的文件格式，请使用 txt/docx/pdf")
     except Exception as e:
         raise ValueError(f"文件读取失败：{str(e)}") from e
 
 
+def extract_file_text(file_obj) -> str:
+    """从各种文件格式提取文本"""
+    # 检查文件大小（在触碰任何解析器之前拦截超大文件）
+    size_mb = _file_size(file_obj) / (1024 * 1024)
+
+    if size_mb > Config.MAX_FILE_SIZE_MB:
+        raise ValueError(f"文件过大（{size_mb:.1f}MB），最大支持 {Config.MAX_FILE_SIZE_MB}MB")
+
+    return _extract_text_cached(file_obj.name.lower(), file_obj.read())
+
+
 def build_docx_bytes(text: str) -> bytes:
     """构建 DOCX 文件的字节数据"""
     document = Document()
@@ -344,16 +571,19 @@ def build_zip_bundle(
     buffer = io.BytesIO()
     with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
         bundle.writestr(f"masked_{stamp}.docx", masked_docx)
-        bundle.writestr(
-            f"restore_{stamp}.json",
-            json.dumps(encrypted_dict, ensure_ascii=False, indent=2).encode("utf-8")
-        )
+        bundle.writestr(f"restore_{stamp}.bin", serialize_binary(encrypted_dict))
     buffer.seek(0)
     return buffer.read()
 
 
 # ============= Streamlit UI =============
 
+@st.cache_data(show_spinner=False)
+def _css() -> str:
+    """从磁盘读取样式表，进程内只读一次"""
+    return (Path(__file__).parent / "assets" / "app.css").read_text(encoding="utf-8")
+
+
 def init_page_style():
     """初始化页面样式"""
     st.set_page_config(
@@ -362,248 +592,7 @@ def init_page_style():
         page_icon="🔒"
     )
 
-    st.markdown(
-        """
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&family=JetBrains+Mono:wght@400;500&display=swap');
-
-        :root {
-            --bg-primary: #0a0e1a;
-            --bg-secondary: #111827;
-            --bg-card: rgba(17, 24, 39, 0.7);
-            --bg-elevated: rgba(31, 41, 55, 0.5);
-            --border-color: rgba(99, 102, 241, 0.2);
-            --border-hover: rgba(99, 102, 241, 0.4);
-            --accent-primary: #818cf8;
-            --accent-secondary: #6366f1;
-            --accent-glow: rgba(99, 102, 241, 0.15);
-            --text-primary: #f3f4f6;
-            --text-secondary: #9ca3af;
-            --text-muted: #6b7280;
-            --success: #34d399;
-            --warning: #fbbf24;
-            --error: #f87171;
-            --shadow-sm: 0 1px 2px 0 rgba(0, 0, 0, 0.3);
-            --shadow-md: 0 4px 6px -1px rgba(0, 0, 0, 0.4);
-            --shadow-lg: 0 10px 15px -3px rgba(0, 0, 0, 0.5);
-            --shadow-glow: 0 0 20px rgba(99, 102, 241, 0.3);
-        }
-
-        * {
-            box-sizing: border-box;
-        }
-
-        html, body, .stApp {
-            font-family: "Inter", -apple-system, BlinkMacSystemFont, sans-serif;
-            color: var(--text-primary);
-            background: var(--bg-primary);
-        }
-
-        body::before {
-            content: '';
-            position: fixed;
-            top: 0;
-            left: 0;
-            right: 0;
-            bottom: 0;
-            background:
-                radial-gradient(circle at 20% 20%, rgba(99, 102, 241, 0.08) 0%, transparent 50%),
-                radial-gradient(circle at 80% 80%, rgba(139, 92, 246, 0.06) 0%, transparent 50%),
-                radial-gradient(circle at 40% 60%, rgba(59, 130, 246, 0.05) 0%, transparent 50%);
-            pointer-events: none;
-            z-index: -1;
-        }
-
-        .block-container {
-            padding-top: 2.5rem;
-            padding-bottom: 2rem;
-            max-width: 1400px;
-        }
-
-        .app-header {
-            text-align: center;
-            margin-bottom: 2.5rem;
-            animation: fadeInDown 0.6s ease-out;
-        }
-
-        .app-header h1 {
-            font-size: clamp(28px, 5vw, 42px);
-            font-weight: 700;
-            background: linear-gradient(135deg, var(--accent-primary) 0%, var(--accent-secondary) 100%);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            background-clip: text;
-            margin: 0 0 0.5rem 0;
-            letter-spacing: -0.02em;
-        }
-
-        .app-header p {
-            color: var(--text-secondary);
-            font-size: 16px;
-            margin: 0;
-            max-width: 600px;
-            margin-left: auto;
-            margin-right: auto;
-            line-height: 1.6;
-        }
-
-        .card {
-            background: var(--bg-card);
-            border: 1px solid var(--border-color);
-            border-radius: 16px;
-            padding: 1.5rem;
-            backdrop-filter: blur(20px);
-            box-shadow: var(--shadow-md), var(--shadow-glow);
-            transition: all 0.3s ease;
-            animation: fadeInUp 0.6s ease-out backwards;
-        }
-
-        .card:hover {
-            border-color: var(--border-hover);
-            box-shadow: var(--shadow-lg), var(--shadow-glow);
-        }
-
-        .card-title {
-            font-size: 1.1rem;
-            font-weight: 600;
-            color: var(--text-primary);
-            margin: 0 0 1rem 0;
-            display: flex;
-            align-items: center;
-            gap: 0.5rem;
-        }
-
-        .card-title::before {
-            content: '';
-            width: 4px;
-            height: 18px;
-            background: linear-gradient(180deg, var(--accent-primary) 0%, var(--accent-secondary) 100%);
-            border-radius: 2px;
-        }
-
-        .stTextArea > div > div > textarea,
-        .stTextInput > div > div > input,
-        .stSelectbox > div > div > select {
-            background: var(--bg-elevated);
-            border: 1px solid var(--border-color);
-            border-radius: 10px;
-            color: var(--text-primary);
-            font-family: "JetBrains Mono", monospace;
-            font-size: 14px;
-            transition: all 0.2s ease;
-        }
-
-        .stTextArea > div > div > textarea:focus,
-        .stTextInput > div > div > input:focus,
-        .stSelectbox > div > div > select:focus {
-            border-color: var(--accent-secondary);
-            box-shadow: 0 0 0 3px var(--accent-glow);
-            outline: none;
-        }
-
-        .stButton > button {
-            background: linear-gradient(135deg, var(--accent-secondary) 0%, var(--accent-primary) 100%);
-            color: white;
-            border: none;
-            border-radius: 10px;
-            padding: 0.6rem 1.5rem;
-            font-weight: 600;
-            font-size: 15px;
-            transition: all 0.2s ease;
-            box-shadow: 0 4px 12px rgba(99, 102, 241, 0.3);
-        }
-
-        .stButton > button:hover {
-            transform: translateY(-1px);
-            box-shadow: 0 6px 16px rgba(99, 102, 241, 0.4);
-        }
-
-        .stButton > button:active {
-            transform: translateY(0);
-        }
-
-        .secondary-btn .stButton > button {
-            background: linear-gradient(135deg, var(--success) 0%, #10b981 100%);
-            box-shadow: 0 4px 12px rgba(52, 211, 153, 0.3);
-        }
-
-        .info-box {
-            background: var(--bg-elevated);
-            border-left: 3px solid var(--accent-primary);
-            border-radius: 8px;
-            padding: 1rem;
-            margin: 1rem 0;
-            font-size: 0.9rem;
-            color: var(--text-secondary);
-        }
-
-        .success-text {
-            color: var(--success);
-            font-weight: 500;
-        }
-
-        .error-text {
-            color: var(--error);
-            font-weight: 500;
-        }
-
-        .stats-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(120px, 1fr));
-            gap: 0.8rem;
-            margin: 1rem 0;
-        }
-
-        .stat-item {
-            background: var(--bg-elevated);
-            border-radius: 10px;
-            padding: 0.8rem;
-            text-align: center;
-            border: 1px solid var(--border-color);
-        }
-
-        .stat-value {
-            font-size: 1.5rem;
-            font-weight: 700;
-            color: var(--accent-primary);
-        }
-
-        .stat-label {
-            font-size: 0.8rem;
-            color: var(--text-muted);
-            margin-top: 0.2rem;
-        }
-
-        @keyframes fadeInDown {
-            from {
-                opacity: 0;
-                transform: translateY(-20px);
-            }
-            to {
-                opacity: 1;
-                transform: translateY(0);
-            }
-        }
-
-        @keyframes fadeInUp {
-            from {
-                opacity: 0;
-                transform: translateY(20px);
-            }
-            to {
-                opacity: 1;
-                transform: translateY(0);
-            }
-        }
-
-        /* 卡片动画延迟 */
-        .card:nth-child(1) { animation-delay: 0.1s; }
-        .card:nth-child(2) { animation-delay: 0.2s; }
-        .card:nth-child(3) { animation-delay: 0.3s; }
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
+    st.markdown(f"<style>{_css()}</style>", unsafe_allow_html=True)
 
 
 def render_header():
@@ -723,8 +712,8 @@ def render_restore_card():
     st.markdown('<div class="card-title">🔓 还原原文</div>', unsafe_allow_html=True)
 
     restore_file = st.file_uploader(
-        "选择加密还原文件（JSON）",
-        type=["json"],
+        "选择加密还原文件（BIN/JSON）",
+        type=["bin", "json"],
         key="restore_file"
     )
 
@@ -839,7 +828,7 @@ def main():
 
             # 加密原文
             encrypted = encrypt_text(text, password, keywords_list)
-            encrypted_dict = asdict(encrypted)
+            encrypted_dict = encrypted.to_dict()
 
             # 生成文件
             stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -890,8 +879,12 @@ def main():
                 st.error("❌ 请输入还原密码")
                 st.stop()
 
-            # 读取并解密
-            payload = json.loads(restore_file.read().decode("utf-8"))
+            # 读取并解密：按格式标识区分二进制容器/旧版 JSON 还原文件
+            raw = restore_file.read()
+            if raw[:4] == _PACK_MAGIC:
+                payload = deserialize_binary(raw)
+            else:
+                payload = json.loads(raw.decode("utf-8"))
             plain = decrypt_text(payload, restore_password)
 
             # 生成文档
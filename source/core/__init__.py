@@ -11,13 +11,21 @@ from .masking import (
     build_masked_text,
     PREDEFINED_PATTERNS,
 )
-from .encryption import derive_key, encrypt_text, decrypt_text
+from .encryption import (
+    derive_key,
+    clear_key_cache,
+    encrypt_text,
+    decrypt_text,
+    pack_result,
+    unpack_result,
+)
 from .file_handler import (
     extract_file_text,
     load_docx_text,
     load_pdf_text,
     build_docx_bytes,
     build_zip_bundle,
+    build_zip_bundle_into,
 )
 from .enhanced_doc import (
     extract_docx_with_format,
@@ -39,14 +47,18 @@ __all__ = [
     "PREDEFINED_PATTERNS",
     # 加密解密
     "derive_key",
+    "clear_key_cache",
     "encrypt_text",
     "decrypt_text",
+    "pack_result",
+    "unpack_result",
     # 文件处理
     "extract_file_text",
     "load_docx_text",
     "load_pdf_text",
     "build_docx_bytes",
     "build_zip_bundle",
+    "build_zip_bundle_into",
     # 增强文档处理
     "extract_docx_with_format",
     "build_docx_with_format",
@@ -4,25 +4,82 @@
 """
 
 import base64
+import hashlib
+import json
+import logging
 import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import lru_cache
 
 try:
     from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-    from cryptography.hazmat.primitives import hashes
 except ImportError:
     raise ImportError(
         "缺少依赖库 cryptography，请先安装：pip install cryptography"
     )
 
 
+logger = logging.getLogger(__name__)
+
+# AES-GCM 吞吐量低于该值（MB/s）时，大概率是 OpenSSL 构建
+# 没有启用 AES-NI（常见于 Alpine/musl 精简镜像），走了软件实现
+_AESNI_MIN_THROUGHPUT_MB_S = 500
+_runtime_checked = False
+
+
+def _check_crypto_runtime():
+    """首次加密时做一次性的 OpenSSL/AES-NI 自检
+
+    cryptography 把 AES-GCM 委托给 OpenSSL，有无 AES-NI 硬件加速
+    吞吐量相差约 10 倍。用 1MB 数据跑一次加密测吞吐，
+    明显偏慢时给出告警，帮助及早发现部署环境问题。
+    """
+    global _runtime_checked
+    if _runtime_checked:
+        return
+    _runtime_checked = True
+
+    try:
+        from cryptography.hazmat.backends.openssl import backend
+        logger.info("OpenSSL 版本：%s", backend.openssl_version_text())
+    except Exception:  # 不同版本的 cryptography 后端接口略有差异
+        pass
+
+    try:
+        aesgcm = AESGCM(b"\x00" * Config.KEY_LENGTH)
+        payload = b"\x00" * (1024 * 1024)
+        start = time.perf_counter()
+        aesgcm.encrypt(b"\x00" * Config.NONCE_LENGTH, payload, None)
+        elapsed = time.perf_counter() - start
+        throughput = 1.0 / elapsed if elapsed > 0 else float("inf")
+        if throughput < _AESNI_MIN_THROUGHPUT_MB_S:
+            logger.warning(
+                "AES-GCM 吞吐量仅 %.0f MB/s，AES-NI 可能未启用；"
+                "请检查 OpenSSL 构建（避免使用 Alpine 等精简镜像）",
+                throughput,
+            )
+    except Exception:
+        pass  # 自检失败不影响正常加密流程
+
+
+# 批量加密并行化的总量阈值：低于此值线程池开销得不偿失
+_PARALLEL_MIN_TOTAL_BYTES = 256 * 1024
+
+
 class Config:
     """加密配置常量"""
     SALT_LENGTH = 16
     NONCE_LENGTH = 12
     PBKDF2_ITERATIONS = 120000
     KEY_LENGTH = 32
+    # 默认 KDF：scrypt 的内存困难特性在现代 CPU 上
+    # 比纯迭代的 PBKDF2 提供更好的"每毫秒安全性"
+    KDF_ALGO = "scrypt"
+    SCRYPT_PARAMS = {"n": 2 ** 15, "r": 8, "p": 1}
 
 
 @dataclass
@@ -35,47 +92,371 @@ class EncryptionResult:
     version: str
     original_length: int
     masked_keywords: list
+    kdf: str = "pbkdf2"
+    kdf_params: dict = None
+
+
+# 进程内密钥派生缓存：KDF 故意设计得慢（这正是它的意义），
+# 但同一会话用同一密码处理多个文件时没必要重复付这笔开销。
+# 缓存键只存密码的 SHA-256 摘要，不保留明文密码；仅进程内有效
+_KDF_CACHE: dict = {}
+_KDF_CACHE_MAX = 32
+
+# 随机字节池：os.urandom 每次调用都是一次系统调用，批量加密时
+# 盐值/Nonce 的获取成本可观。一次取 4KB 慢慢切片，字节仍然全部
+# 来自内核 CSPRNG，唯一性/不可预测性不受影响
+_RNG_BUF_SIZE = 4096
+_rng_buf = b""
+_rng_pos = 0
+_rng_lock = threading.Lock()
+
+
+def _take(n: int) -> bytes:
+    """从随机字节池切出 n 字节，耗尽时整池补满"""
+    global _rng_buf, _rng_pos
+    with _rng_lock:
+        if _rng_pos + n > len(_rng_buf):
+            _rng_buf = os.urandom(max(_RNG_BUF_SIZE, n))
+            _rng_pos = 0
+        chunk = _rng_buf[_rng_pos:_rng_pos + n]
+        _rng_pos += n
+        return chunk
+
 
+def _reset_rng_pool() -> None:
+    """fork 后在子进程里丢弃随机池
 
-def derive_key(password: str, salt: bytes) -> bytes:
-    """从密码派生加密密钥"""
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=Config.KEY_LENGTH,
-        salt=salt,
-        iterations=Config.PBKDF2_ITERATIONS,
+    父子进程若继续消费同一池子，会切出完全相同的盐值/Nonce——
+    同密钥下 Nonce 重复对 AES-GCM 是灾难性的。os.urandom 本身
+    fork 安全，清池后两边各自重新向内核取随机数即可。
+    """
+    global _rng_buf, _rng_pos
+    _rng_buf = b""
+    _rng_pos = 0
+
+
+if hasattr(os, "register_at_fork"):  # Windows 无 fork
+    os.register_at_fork(after_in_child=_reset_rng_pool)
+
+
+@lru_cache(maxsize=8)
+def _get_aesgcm(key: bytes) -> AESGCM:
+    """按密钥缓存 AESGCM 对象
+
+    构造 AESGCM 要在 OpenSSL 里跑一次 AES 密钥扩展；一把密钥
+    加解密多段数据时（Nonce 每次单独传入）没必要重复做。
+    """
+    return AESGCM(key)
+
+
+def clear_key_cache() -> None:
+    """清空派生密钥与 AESGCM 对象缓存（会话结束/窗口关闭时调用）"""
+    _KDF_CACHE.clear()
+    _get_aesgcm.cache_clear()
+
+
+def derive_key(password: str, salt: bytes, kdf: str = None, kdf_params: dict = None) -> bytes:
+    """从密码派生加密密钥（带进程内缓存）
+
+    默认使用 Config.KDF_ALGO；解密旧版（version 2.0，无 kdf 字段）
+    载荷时由调用方显式传入 "pbkdf2"。
+    """
+    kdf = kdf or Config.KDF_ALGO
+    cache_key = (
+        hashlib.sha256(password.encode("utf-8")).digest(),
+        salt,
+        kdf,
+        tuple(sorted(kdf_params.items())) if kdf_params else None,
     )
-    return kdf.derive(password.encode("utf-8"))
+    key = _KDF_CACHE.get(cache_key)
+    if key is not None:
+        return key
+
+    key = _derive_key_uncached(password, salt, kdf, kdf_params)
+    if len(_KDF_CACHE) >= _KDF_CACHE_MAX:
+        _KDF_CACHE.pop(next(iter(_KDF_CACHE)))  # 淘汰最早的条目
+    _KDF_CACHE[cache_key] = key
+    return key
+
+
+def _derive_key_uncached(password: str, salt: bytes, kdf: str, kdf_params: dict) -> bytes:
+    """实际执行 KDF 计算
+
+    走 hashlib 的 OpenSSL 绑定：计算期间释放 GIL，且在支持
+    SHA 扩展指令的 CPU 上自动用硬件加速的 SHA-256 轮函数，
+    派生结果与 cryptography 的 KDF 类逐位一致。
+    """
+    if kdf == "scrypt":
+        params = kdf_params or Config.SCRYPT_PARAMS
+        return hashlib.scrypt(
+            password.encode("utf-8"),
+            salt=salt,
+            n=params["n"],
+            r=params["r"],
+            p=params["p"],
+            # OpenSSL 默认内存上限约 32MB，恰好卡在 n=2^15 的用量上，放宽一倍
+            maxmem=256 * params["n"] * params["r"] * params["p"],
+            dklen=Config.KEY_LENGTH,
+        )
+
+    if kdf == "pbkdf2":
+        params = kdf_params or {"iterations": Config.PBKDF2_ITERATIONS}
+        return hashlib.pbkdf2_hmac(
+            "sha256",
+            password.encode("utf-8"),
+            salt,
+            params["iterations"],
+            dklen=Config.KEY_LENGTH,
+        )
+
+    raise ValueError(f"不支持的 KDF 算法：{kdf}")
 
 
 def encrypt_text(text: str, password: str, keywords: list) -> EncryptionResult:
     """加密原文并保存元数据"""
-    salt = os.urandom(Config.SALT_LENGTH)
+    _check_crypto_runtime()
+    salt = _take(Config.SALT_LENGTH)
     key = derive_key(password, salt)
-    aesgcm = AESGCM(key)
-    nonce = os.urandom(Config.NONCE_LENGTH)
+    aesgcm = _get_aesgcm(key)
+    nonce = _take(Config.NONCE_LENGTH)
     data = aesgcm.encrypt(nonce, text.encode("utf-8"), None)
 
     return EncryptionResult(
-        salt=base64.b64encode(salt).decode("utf-8"),
-        nonce=base64.b64encode(nonce).decode("utf-8"),
-        data=base64.b64encode(data).decode("utf-8"),
+        salt=base64.b64encode(salt).decode("ascii"),
+        nonce=base64.b64encode(nonce).decode("ascii"),
+        data=base64.b64encode(data).decode("ascii"),
         created_at="",  # 由调用方设置
         version="2.0",
         original_length=len(text),
-        masked_keywords=keywords
+        masked_keywords=keywords,
+        kdf=Config.KDF_ALGO,
+        kdf_params=dict(Config.SCRYPT_PARAMS) if Config.KDF_ALGO == "scrypt" else None
     )
 
 
-def decrypt_text(payload: dict, password: str) -> str:
-    """解密还原原文"""
+def encrypt_batch(items: list, password: str, keywords: list = None) -> list:
+    """批量加密多段文本
+
+    所有条目共享一个盐值，密钥只派生一次，AESGCM 对象只构造一次；
+    每个条目使用独立的随机 Nonce，保证密文各不相同。
+    适用于一次会话中加密多个文件/多段原文的场景。
+    """
+    _check_crypto_runtime()
+    keywords = keywords or []
+    salt = _take(Config.SALT_LENGTH)
+    key = derive_key(password, salt)
+    aesgcm = _get_aesgcm(key)
+    salt_b64 = base64.b64encode(salt).decode("ascii")
+
+    encoded = [text.encode("utf-8") for text in items]
+    nonces = [_take(Config.NONCE_LENGTH) for _ in items]
+
+    # OpenSSL 在加密大缓冲区时释放 GIL，条目彼此独立（各有随机 Nonce），
+    # 总量足够大时用线程池并行加密可接近线性加速；小批量不值得线程开销
+    if len(items) > 1 and sum(len(data) for data in encoded) >= _PARALLEL_MIN_TOTAL_BYTES:
+        workers = min(len(items), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            blobs = list(executor.map(
+                lambda pair: aesgcm.encrypt(pair[0], pair[1], None),
+                zip(nonces, encoded)
+            ))
+    else:
+        blobs = [
+            aesgcm.encrypt(nonce, data, None)
+            for nonce, data in zip(nonces, encoded)
+        ]
+
+    results = []
+    for text, nonce, blob in zip(items, nonces, blobs):
+        results.append(EncryptionResult(
+            salt=salt_b64,
+            nonce=base64.b64encode(nonce).decode("ascii"),
+            data=base64.b64encode(blob).decode("ascii"),
+            created_at="",  # 由调用方设置
+            version="2.0",
+            original_length=len(text),
+            masked_keywords=keywords,
+            kdf=Config.KDF_ALGO,
+            kdf_params=dict(Config.SCRYPT_PARAMS) if Config.KDF_ALGO == "scrypt" else None
+        ))
+    return results
+
+
+# 并行分块容器：chunk_count(u32) | chunk_size(u32) | 各块密文（每块含16字节tag）
+_CHUNK_HEADER = struct.Struct("<II")
+_PARALLEL_CHUNK_SIZE = 64 * 1024
+
+
+def _chunk_nonce(base_nonce: bytes, index: int) -> bytes:
+    """第 index 块的 Nonce：基准 Nonce 异或块序号，同一密钥下互不重复"""
+    return (int.from_bytes(base_nonce, "big") ^ index).to_bytes(len(base_nonce), "big")
+
+
+def _chunk_aad(index: int, chunk_count: int) -> bytes:
+    """第 index 块的附加认证数据：块序号 + 总块数
+
+    每块的 GCM tag 只保护本块内容，不保护消息结构；把 (序号, 总数)
+    绑进 AAD 后，截断容器并改小头部 chunk_count 会让最后一块的
+    tag 校验失败，而不是悄悄还原出变短的明文。
+    """
+    return _CHUNK_HEADER.pack(index, chunk_count)
+
+
+def encrypt_text_parallel(plaintext: bytes, key: bytes, base_nonce: bytes,
+                          chunk_size: int = _PARALLEL_CHUNK_SIZE) -> bytes:
+    """把大明文切块后多线程 AES-GCM 加密，返回自描述的分块容器
+
+    OpenSSL 加密大缓冲区时释放 GIL，各块 Nonce 互不相同且彼此独立，
+    线程池并行后吞吐量随核数扩展。明文低于并行阈值时退化为顺序
+    加密，容器格式不变。与 encrypt_text 的单体格式不兼容，须用
+    decrypt_text_parallel 还原。
+    """
+    aesgcm = _get_aesgcm(key)
+    chunks = [
+        plaintext[offset:offset + chunk_size]
+        for offset in range(0, len(plaintext), chunk_size)
+    ] or [b""]
+    chunk_count = len(chunks)
+    nonces = [_chunk_nonce(base_nonce, index) for index in range(chunk_count)]
+    aads = [_chunk_aad(index, chunk_count) for index in range(chunk_count)]
+
+    if chunk_count > 1 and len(plaintext) >= _PARALLEL_MIN_TOTAL_BYTES:
+        workers = min(chunk_count, os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            blobs = list(executor.map(
+                lambda args: aesgcm.encrypt(args[0], args[1], args[2]),
+                zip(nonces, chunks, aads)
+            ))
+    else:
+        blobs = [
+            aesgcm.encrypt(nonce, chunk, aad)
+            for nonce, chunk, aad in zip(nonces, chunks, aads)
+        ]
+
+    return _CHUNK_HEADER.pack(chunk_count, chunk_size) + b"".join(blobs)
+
+
+def decrypt_text_parallel(blob: bytes, key: bytes, base_nonce: bytes) -> bytes:
+    """解密 encrypt_text_parallel 产出的分块容器"""
+    try:
+        chunk_count, chunk_size = _CHUNK_HEADER.unpack_from(blob)
+    except struct.error as e:
+        raise ValueError("加密文件格式错误或已损坏") from e
+
+    # 每块密文 = 明文块 + 16字节认证tag，只有最后一块可能不满；
+    # 容器总长必须恰好被块切分覆盖，多出的尾部字节视为篡改
+    sealed_size = chunk_size + 16
+    offset = _CHUNK_HEADER.size
+    body_len = len(blob) - offset
+    if chunk_count < 1 or body_len < (chunk_count - 1) * sealed_size + 16 \
+            or body_len > chunk_count * sealed_size:
+        raise ValueError("加密文件格式错误或已损坏")
+
+    sealed = [
+        blob[offset + index * sealed_size:offset + (index + 1) * sealed_size]
+        for index in range(chunk_count)
+    ]
+    nonces = [_chunk_nonce(base_nonce, index) for index in range(chunk_count)]
+    aads = [_chunk_aad(index, chunk_count) for index in range(chunk_count)]
+
+    aesgcm = _get_aesgcm(key)
+    try:
+        if chunk_count > 1 and len(blob) >= _PARALLEL_MIN_TOTAL_BYTES:
+            workers = min(chunk_count, os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                plains = list(executor.map(
+                    lambda args: aesgcm.decrypt(args[0], args[1], args[2]),
+                    zip(nonces, sealed, aads)
+                ))
+        else:
+            plains = [
+                aesgcm.decrypt(nonce, chunk, aad)
+                for nonce, chunk, aad in zip(nonces, sealed, aads)
+            ]
+    except Exception as e:
+        raise ValueError("解密失败：密码错误或文件已损坏") from e
+
+    return b"".join(plains)
+
+
+# 二进制还原容器：magic(4) | version(u16) | salt_len(u8) | salt |
+# nonce_len(u8) | nonce | header_len(u32) | header_json | ciphertext
+# 盐值/Nonce/密文直接存原始字节，省掉 base64 带来的 33% 体积和编解码开销
+_PACK_MAGIC = b"LDAR"
+_PACK_VERSION = 1
+
+
+def pack_result(result: EncryptionResult) -> bytes:
+    """把加密结果打包为二进制还原容器"""
+    salt = base64.b64decode(result.salt)
+    nonce = base64.b64decode(result.nonce)
+    data = base64.b64decode(result.data)
+    header = json.dumps({
+        "created_at": result.created_at,
+        "version": result.version,
+        "original_length": result.original_length,
+        "masked_keywords": result.masked_keywords,
+        "kdf": result.kdf,
+        "kdf_params": result.kdf_params,
+    }, ensure_ascii=False).encode("utf-8")
+
+    return b"".join([
+        _PACK_MAGIC,
+        struct.pack("<H", _PACK_VERSION),
+        struct.pack("<B", len(salt)), salt,
+        struct.pack("<B", len(nonce)), nonce,
+        struct.pack("<I", len(header)), header,
+        data,
+    ])
+
+
+def unpack_result(blob: bytes) -> tuple:
+    """解析二进制还原容器，返回 (元数据, 盐值, Nonce, 密文)"""
+    if blob[:4] != _PACK_MAGIC:
+        raise ValueError("加密文件格式错误或已损坏")
+    offset = 4
+    (container_version,) = struct.unpack_from("<H", blob, offset)
+    if container_version != _PACK_VERSION:
+        raise ValueError(f"不支持的还原文件版本：{container_version}")
+    offset += 2
+    salt_len = blob[offset]
+    offset += 1
+    salt = blob[offset:offset + salt_len]
+    offset += salt_len
+    nonce_len = blob[offset]
+    offset += 1
+    nonce = blob[offset:offset + nonce_len]
+    offset += nonce_len
+    (header_len,) = struct.unpack_from("<I", blob, offset)
+    offset += 4
+    meta = json.loads(blob[offset:offset + header_len])
+    offset += header_len
+    return meta, salt, nonce, blob[offset:]
+
+
+def decrypt_text(payload, password: str) -> str:
+    """解密还原原文
+
+    payload 既可以是旧版 JSON 载荷（dict），
+    也可以是 pack_result 生成的二进制容器（bytes）。
+    """
     try:
-        salt = base64.b64decode(payload["salt"])
-        nonce = base64.b64decode(payload["nonce"])
-        data = base64.b64decode(payload["data"])
-        key = derive_key(password, salt)
-        aesgcm = AESGCM(key)
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            meta, salt, nonce, data = unpack_result(bytes(payload))
+        else:
+            meta = payload
+            salt = base64.b64decode(payload["salt"])
+            nonce = base64.b64decode(payload["nonce"])
+            data = base64.b64decode(payload["data"])
+        # 旧版（version 2.0）载荷没有 kdf 字段，按 PBKDF2 处理
+        key = derive_key(
+            password,
+            salt,
+            kdf=meta.get("kdf", "pbkdf2"),
+            kdf_params=meta.get("kdf_params"),
+        )
+        aesgcm = _get_aesgcm(key)
         plain = aesgcm.decrypt(nonce, data, None)
         return plain.decode("utf-8")
-    except (KeyError, ValueError) as e:
+    except (KeyError, ValueError, struct.error, IndexError) as e:
         raise ValueError("加密文件格式错误或已损坏") from e
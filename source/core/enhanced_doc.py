@@ -3,12 +3,19 @@
 支持保持原文档的格式、标题、字号等
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from typing import List, Tuple
+
+from lxml import etree
+
+from .file_handler import parse_docx_parts
+
 from docx import Document
 from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
 
 @dataclass
 class ParagraphData:
@@ -25,60 +32,48 @@ class ParagraphData:
     table_data: List[List[str]] = None
 
 
-def extract_docx_with_format(file_obj) -> List[ParagraphData]:
-    """从 DOCX 文件提取文本和格式信息"""
-    try:
-        document = Document(file_obj)
-        paragraphs_data = []
+@dataclass
+class ParagraphColumns:
+    """段落数据的列式存储（SoA）
 
-        # 提取段落（包含格式）
-        for paragraph in document.paragraphs:
-            # 获取文本
-            text = paragraph.text
-
-            # 获取样式信息
-            style = paragraph.style
-            style_name = style.name if style else None
-
-            # 判断是否为标题
-            heading_level = None
-            is_title = False
-            if style_name:
-                if "Heading" in style_name:
-                    try:
-                        heading_level = int(style_name.split()[-1])
-                    except (ValueError, IndexError):
-                        heading_level = None
-                elif "Title" in style_name:
-                    is_title = True
-
-            # 获取字体属性
-            runs = paragraph.runs
-            is_bold = False
-            is_italic = False
-            font_size = None
-
-            if runs:
-                first_run = runs[0]
-                if first_run.font.bold:
-                    is_bold = True
-                if first_run.font.italic:
-                    is_italic = True
-                if first_run.font.size:
-                    font_size = first_run.font.size.pt
-
-            # 获取对齐方式
-            alignment = None
-            if paragraph.alignment:
-                alignment_map = {
-                    0: "left",
-                    1: "center",
-                    2: "right",
-                    3: "justify"
-                }
-                alignment = alignment_map.get(paragraph.alignment, "left")
-
-            paragraphs_data.append(ParagraphData(
+    下游各遍处理（脱敏、重建）大多只碰 text 一列；列式布局让
+    只换文本的操作成为一次列表推导，其余列按引用零拷贝共享，
+    不必为每个段落重建完整的 ParagraphData 对象。
+    """
+    texts: List[str]
+    style_names: List[str]
+    heading_levels: List[int]
+    bold_flags: List[bool]
+    italic_flags: List[bool]
+    font_sizes: List[float]
+    alignments: List[str]
+    title_flags: List[bool]
+    table_flags: List[bool]
+    table_datas: List[list]
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @classmethod
+    def from_records(cls, records: List[ParagraphData]) -> "ParagraphColumns":
+        """从 ParagraphData 列表构建列式存储"""
+        return cls(
+            texts=[r.text for r in records],
+            style_names=[r.style_name for r in records],
+            heading_levels=[r.heading_level for r in records],
+            bold_flags=[r.is_bold for r in records],
+            italic_flags=[r.is_italic for r in records],
+            font_sizes=[r.font_size for r in records],
+            alignments=[r.alignment for r in records],
+            title_flags=[r.is_title for r in records],
+            table_flags=[r.is_table for r in records],
+            table_datas=[r.table_data for r in records],
+        )
+
+    def to_records(self) -> List[ParagraphData]:
+        """还原为 ParagraphData 列表（兼容按行访问的消费方）"""
+        return [
+            ParagraphData(
                 text=text,
                 style_name=style_name,
                 heading_level=heading_level,
@@ -86,17 +81,157 @@ def extract_docx_with_format(file_obj) -> List[ParagraphData]:
                 is_italic=is_italic,
                 font_size=font_size,
                 alignment=alignment,
-                is_title=is_title
-            ))
+                is_title=is_title,
+                is_table=is_table,
+                table_data=table_data,
+            )
+            for text, style_name, heading_level, is_bold, is_italic,
+                font_size, alignment, is_title, is_table, table_data
+            in zip(
+                self.texts, self.style_names, self.heading_levels,
+                self.bold_flags, self.italic_flags, self.font_sizes,
+                self.alignments, self.title_flags, self.table_flags,
+                self.table_datas,
+            )
+        ]
+
+    def with_texts(self, texts: List[str]) -> "ParagraphColumns":
+        """只替换文本列，其余列按引用共享"""
+        return replace(self, texts=texts)
+
+
+def _w(tag: str) -> str:
+    """带 WordprocessingML 命名空间的标签名"""
+    return f"{{{_W_NS}}}{tag}"
+
+
+def _xml_text(paragraph) -> str:
+    """拼接一个 <w:p> 节点下所有 <w:t> 的文本"""
+    return "".join(t.text for t in paragraph.iter(_w("t")) if t.text)
+
+
+def _load_style_names(styles_root) -> dict:
+    """styleId -> 样式显示名（如 Heading 1）映射"""
+    style_names = {}
+    if styles_root is None:
+        return style_names
+    for style in styles_root.iter(_w("style")):
+        style_id = style.get(_w("styleId"))
+        name = style.find(_w("name"))
+        if style_id and name is not None:
+            style_names[style_id] = name.get(_w("val"))
+    return style_names
+
+
+# 段落格式的预编译 XPath：比逐级 find 链少走一层 Python 分派
+_XP_STYLE_ID = etree.XPath("w:pPr/w:pStyle/@w:val", namespaces={"w": _W_NS})
+_XP_JC_VAL = etree.XPath("w:pPr/w:jc/@w:val", namespaces={"w": _W_NS})
+_XP_FIRST_RPR = etree.XPath("w:r[1]/w:rPr", namespaces={"w": _W_NS})
+
+
+def _parse_paragraph_format(paragraph, style_names: dict) -> ParagraphData:
+    """从 <w:p> 节点直接读取文本和格式信息"""
+    text = _xml_text(paragraph)
+
+    # 样式名：pPr/pStyle 的 styleId 经 styles.xml 映射为显示名
+    style_name = "Normal"
+    style_ids = _XP_STYLE_ID(paragraph)
+    if style_ids:
+        style_name = style_names.get(style_ids[0], style_ids[0])
+        # styles.xml 里内置标题样式名为小写（heading 1），
+        # python-docx 会规范化为 Heading 1，这里保持一致
+        if style_name and style_name.startswith("heading "):
+            style_name = "H" + style_name[1:]
+
+    # 与 python-docx 路径一致：左对齐视为默认，不单独记录
+    alignment = None
+    jc_vals = _XP_JC_VAL(paragraph)
+    if jc_vals:
+        alignment = {
+            "center": "center",
+            "right": "right",
+            "both": "justify",
+            "justify": "justify",
+        }.get(jc_vals[0])
+
+    # 判断是否为标题
+    heading_level = None
+    is_title = False
+    if style_name:
+        if "Heading" in style_name:
+            try:
+                heading_level = int(style_name.split()[-1])
+            except (ValueError, IndexError):
+                heading_level = None
+        elif "Title" in style_name:
+            is_title = True
+
+    # 首个 run 的字体属性（一次 XPath 直达 rPr）
+    is_bold = False
+    is_italic = False
+    font_size = None
+    r_prs = _XP_FIRST_RPR(paragraph)
+    if r_prs:
+        r_pr = r_prs[0]
+        bold = r_pr.find(_w("b"))
+        if bold is not None and bold.get(_w("val")) not in ("0", "false"):
+            is_bold = True
+        italic = r_pr.find(_w("i"))
+        if italic is not None and italic.get(_w("val")) not in ("0", "false"):
+            is_italic = True
+        size = r_pr.find(_w("sz"))
+        if size is not None and size.get(_w("val")):
+            font_size = float(size.get(_w("val"))) / 2  # 半磅值
+
+    return ParagraphData(
+        text=text,
+        style_name=style_name,
+        heading_level=heading_level,
+        is_bold=is_bold,
+        is_italic=is_italic,
+        font_size=font_size,
+        alignment=alignment,
+        is_title=is_title
+    )
+
+
+def extract_docx_with_format(file_obj) -> ParagraphColumns:
+    """从 DOCX 文件提取文本和格式信息
+
+    直接用 lxml 解析 word/document.xml：python-docx 的
+    paragraphs/runs/tables 属性每次访问都要构造包装对象，
+    大文档下是主要开销；裸 XML 遍历在 C 层完成。
+    """
+    try:
+        paragraphs_data = []
+        body_paragraphs = []
+        tables = []
+
+        # 与 load_docx_text 共享解析缓存：同一份文件只解析一次 XML
+        body, styles_root, header_footer_parts = parse_docx_parts(file_obj)
+        style_names = _load_style_names(styles_root)
+
+        for child in body:
+            if child.tag == _w("p"):
+                body_paragraphs.append(child)
+            elif child.tag == _w("tbl"):
+                tables.append(child)
+
+        # 提取段落（包含格式）
+        for paragraph in body_paragraphs:
+            paragraphs_data.append(_parse_paragraph_format(paragraph, style_names))
 
         # 提取表格
-        for table in document.tables:
+        for table in tables:
             table_data = []
-            for row in table.rows:
-                row_data = []
-                for cell in row.cells:
-                    row_data.append(cell.text.strip())
-                table_data.append(row_data)
+            for row in table.findall(_w("tr")):
+                # 单元格文本用一次 itertext C 层遍历整体取出
+                table_data.append([
+                    "\n".join(
+                        "".join(p.itertext()) for p in cell.findall(_w("p"))
+                    ).strip()
+                    for cell in row.findall(_w("tc"))
+                ])
 
             # 将表格作为一个特殊段落
             if table_data:
@@ -108,35 +243,35 @@ def extract_docx_with_format(file_obj) -> List[ParagraphData]:
                 ))
 
         # 提取页眉页脚
-        for section in document.sections:
-            # 页眉
-            for paragraph in section.header.paragraphs:
-                if paragraph.text.strip():
+        for name, part in header_footer_parts:
+            part_style = "Header" if "header" in name else "Footer"
+            for paragraph in part.iter(_w("p")):
+                text = _xml_text(paragraph)
+                if text.strip():
                     paragraphs_data.append(ParagraphData(
-                        text=paragraph.text,
-                        style_name="Header"
+                        text=text,
+                        style_name=part_style
                     ))
 
-            # 页脚
-            for paragraph in section.footer.paragraphs:
-                if paragraph.text.strip():
-                    paragraphs_data.append(ParagraphData(
-                        text=paragraph.text,
-                        style_name="Footer"
-                    ))
-
-        return paragraphs_data
+        # 列式存储：后续只换文本的脱敏遍可以零拷贝共享格式列
+        return ParagraphColumns.from_records(paragraphs_data)
 
     except Exception as e:
         raise ValueError(f"DOCX 文件解析失败：{str(e)}") from e
 
 
-def build_docx_with_format(paragraphs_data: List[ParagraphData]) -> bytes:
-    """根据段落数据构建 DOCX 文件（保持格式）"""
+def build_docx_with_format(paragraphs_data) -> bytes:
+    """根据段落数据构建 DOCX 文件（保持格式）
+
+    接受 ParagraphData 列表或 ParagraphColumns 列式存储。
+    """
     import io
     from docx.shared import Pt, Inches
     from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 
+    if isinstance(paragraphs_data, ParagraphColumns):
+        paragraphs_data = paragraphs_data.to_records()
+
     document = Document()
 
     # 设置默认字体
@@ -209,107 +344,103 @@ def build_docx_with_format(paragraphs_data: List[ParagraphData]) -> bytes:
 
 
 def mask_paragraphs_data(
-    paragraphs_data: List[ParagraphData],
+    paragraphs_data,
     masked_text: str,
     original_text: str
-) -> List[ParagraphData]:
+):
     """
     对段落数据进行脱敏，同时保持格式
 
     Args:
-        paragraphs_data: 原始段落数据列表
+        paragraphs_data: 原始段落数据（ParagraphData 列表或 ParagraphColumns）
         masked_text: 脱敏后的完整文本
         original_text: 原始完整文本
 
     Returns:
-        脱敏后的段落数据列表
+        脱敏后的段落数据，类型与输入一致
     """
-    # 将原始文本按段落分割
-    original_paragraphs = original_text.split('\n')
-    masked_paragraphs = masked_text.split('\n')
+    # 将原始文本按段落分割（splitlines 同时兼容 CRLF）
+    original_paragraphs = original_text.splitlines()
+    masked_paragraphs = masked_text.splitlines()
+
+    # 列式存储快路径：只重建文本列，格式列按引用共享
+    if isinstance(paragraphs_data, ParagraphColumns):
+        texts = paragraphs_data.texts
+        if len(original_paragraphs) != len(masked_paragraphs):
+            by_len = _index_masked_lines(masked_paragraphs)
+            new_texts = [mask_text_in_context(text, by_len) for text in texts]
+        else:
+            new_texts = [
+                (masked_paragraphs[i] if texts[i] else "")
+                if i < len(masked_paragraphs) else texts[i]
+                for i in range(len(texts))
+            ]
+        return paragraphs_data.with_texts(new_texts)
 
     # 如果段落数量不匹配，按行重建
     if len(original_paragraphs) != len(masked_paragraphs):
-        # 简单按行重建
-        result = []
-        for para_data in paragraphs_data:
-            # 在脱敏文本中查找对应段落
-            new_para = ParagraphData(
-                text=mask_text_in_context(para_data.text, masked_text),
-                style_name=para_data.style_name,
-                heading_level=para_data.heading_level,
-                is_bold=para_data.is_bold,
-                is_italic=para_data.is_italic,
-                font_size=para_data.font_size,
-                alignment=para_data.alignment,
-                is_title=para_data.is_title,
-                is_table=para_data.is_table,
-                table_data=para_data.table_data
-            )
-            result.append(new_para)
-        return result
+        # 行长度索引只构建一次，每个段落的查找近似 O(1)
+        by_len = _index_masked_lines(masked_paragraphs)
+        # 在脱敏文本中查找对应段落；replace 只换 text，其余字段浅拷贝
+        return [
+            replace(para_data, text=mask_text_in_context(para_data.text, by_len))
+            for para_data in paragraphs_data
+        ]
 
     # 段落数量匹配，直接替换文本
     result = []
     for i, para_data in enumerate(paragraphs_data):
         if i < len(masked_paragraphs):
-            new_para = ParagraphData(
-                text=masked_paragraphs[i] if para_data.text else "",
-                style_name=para_data.style_name,
-                heading_level=para_data.heading_level,
-                is_bold=para_data.is_bold,
-                is_italic=para_data.is_italic,
-                font_size=para_data.font_size,
-                alignment=para_data.alignment,
-                is_title=para_data.is_title,
-                is_table=para_data.is_table,
-                table_data=para_data.table_data
-            )
-            result.append(new_para)
+            result.append(replace(
+                para_data,
+                text=masked_paragraphs[i] if para_data.text else ""
+            ))
         else:
             result.append(para_data)
 
     return result
 
 
-def mask_text_in_context(original_text: str, masked_full_text: str) -> str:
+def _index_masked_lines(masked_lines: List[str]) -> dict:
+    """按去除首尾空白后的长度索引脱敏行
+
+    跳过空行和完全脱敏（几乎全是*号）的行，
+    这两类行在逐行查找时本来就会被过滤。
+    """
+    by_len = {}
+    for line in masked_lines:
+        line_stripped = line.strip()
+        if not line_stripped:
+            continue
+        if '*' in line_stripped and len([c for c in line_stripped if c != '*']) < 3:
+            continue
+        by_len.setdefault(len(line_stripped), []).append(line_stripped)
+    return by_len
+
+
+def mask_text_in_context(original_text: str, by_len: dict) -> str:
     """
     在完整脱敏文本中找到对应段落的脱敏版本
 
     Args:
         original_text: 原始段落文本
-        masked_full_text: 完整的脱敏文本
+        by_len: _index_masked_lines 构建的 长度 -> 行列表 索引
 
     Returns:
         该段落的脱敏版本
     """
-    # 简单实现：在脱敏文本中查找最相似的段落
-    masked_lines = masked_full_text.split('\n')
-
-    # 找到长度最接近且未完全脱敏的行
-    best_match = ""
-    min_diff = float('inf')
-
     original_stripped = original_text.strip()
-    original_len = len(original_stripped)
-
-    for line in masked_lines:
-        line_stripped = line.strip()
+    if not original_stripped:
+        return ""
 
-        # 跳过空行
-        if not line_stripped:
-            if not original_stripped:
-                return ""
-            continue
-
-        # 跳过完全脱敏的行（全是*号）
-        if '*' in line_stripped and len([c for c in line_stripped if c != '*']) < 3:
-            continue
+    original_len = len(original_stripped)
 
-        # 找到长度最接近的
-        diff = abs(len(line_stripped) - original_len)
-        if diff < min_diff:
-            min_diff = diff
-            best_match = line_stripped
+    # 同长度的行直接命中，否则取长度差最小的桶
+    bucket = by_len.get(original_len)
+    if bucket:
+        return bucket[0]
+    if by_len:
+        nearest = min(by_len, key=lambda length: abs(length - original_len))
+        return by_len[nearest][0]
 
-    return best_match if best_match else original_text
+    return original_text
@@ -4,9 +4,16 @@
 """
 
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+try:
+    # C 实现的多模式匹配，关键词很多时一遍线性扫描即可全部命中
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 
 class MaskMode(Enum):
@@ -26,7 +33,33 @@ class MaskPattern:
     preserve_chars: int = 0
     mask_char: str = "*"
     description: str = ""
+    # 廉价预检：签名 (text, has_digit) -> bool，返回 False 时跳过整个正则扫描；
+    # None 表示无法用子串检查排除，始终执行扫描
+    prefilter: Optional[Callable[[str, bool], bool]] = None
+    # 模块加载时编译好的正则，避免每次调用重新编译
+    compiled: re.Pattern = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.compiled = re.compile(self.pattern)
+
+
+# 车牌号省份前缀字符集，isdisjoint 一次 C 层扫描即可判断能否命中
+_PLATE_PREFIXES = frozenset("京津沪渝冀豫云辽黑湘皖鲁新苏浙赣鄂桂甘晋蒙陕吉闽贵粤青藏川宁琼使领")
 
+# 企业名称后缀词表：正则分支与预检字符集从同一份数据生成，保证二者一致
+_COMPANY_SUFFIXES = (
+    "有限公司", "股份有限公司", "有限责任公司", "集团", "公司", "企业", "厂",
+    "店", "行", "中心", "工作室", "合伙企业", "控股", "科技", "网络", "信息",
+    "技术", "贸易", "商贸", "实业", "发展", "建设", "投资", "管理", "咨询",
+    "服务", "教育", "文化", "传媒", "电子", "汽车", "房地产", "能源", "化工",
+    "制造", "物流", "运输", "建筑", "装饰", "设计", "广告", "餐饮", "酒店",
+    "医院", "学校", "银行", "保险", "证券", "基金",
+)
+# 文本里连一个后缀用字都没有时，企业名称不可能命中
+_COMPANY_CHARS = frozenset("".join(_COMPANY_SUFFIXES))
+
+# 详细地址的行政/门牌单位字符集，同样做 isdisjoint 预检
+_ADDRESS_MARKERS = frozenset("省市区县镇乡街道路巷号栋单元楼层室户")
 
 # 预定义脱敏模式
 PREDEFINED_PATTERNS: Dict[str, MaskPattern] = {
@@ -36,6 +69,7 @@ PREDEFINED_PATTERNS: Dict[str, MaskPattern] = {
         mode=MaskMode.PARTIAL,
         preserve_chars=3,
         mask_char="*",
+        prefilter=lambda text, has_digit: has_digit,
         description="中国大陆手机号，保留前3位"
     ),
     "身份证号": MaskPattern(
@@ -44,6 +78,7 @@ PREDEFINED_PATTERNS: Dict[str, MaskPattern] = {
         mode=MaskMode.PARTIAL,
         preserve_chars=6,
         mask_char="*",
+        prefilter=lambda text, has_digit: has_digit,
         description="18位身份证号，保留前6位"
     ),
     "邮箱": MaskPattern(
@@ -52,6 +87,7 @@ PREDEFINED_PATTERNS: Dict[str, MaskPattern] = {
         mode=MaskMode.PARTIAL,
         preserve_chars=2,
         mask_char="*",
+        prefilter=lambda text, has_digit: "@" in text,
         description="电子邮箱地址，保留前2位"
     ),
     "银行卡号": MaskPattern(
@@ -60,6 +96,7 @@ PREDEFINED_PATTERNS: Dict[str, MaskPattern] = {
         mode=MaskMode.PARTIAL,
         preserve_chars=4,
         mask_char="*",
+        prefilter=lambda text, has_digit: has_digit,
         description="银行卡号，保留前4位"
     ),
     "IP地址": MaskPattern(
@@ -68,6 +105,7 @@ PREDEFINED_PATTERNS: Dict[str, MaskPattern] = {
         mode=MaskMode.PARTIAL,
         preserve_chars=4,
         mask_char="*",
+        prefilter=lambda text, has_digit: has_digit and "." in text,
         description="IPv4地址"
     ),
     "统一社会信用代码": MaskPattern(
@@ -76,14 +114,16 @@ PREDEFINED_PATTERNS: Dict[str, MaskPattern] = {
         mode=MaskMode.PARTIAL,
         preserve_chars=4,
         mask_char="*",
+        prefilter=lambda text, has_digit: has_digit,
         description="18位统一社会信用代码，保留前4位"
     ),
     "企业名称": MaskPattern(
         name="企业名称",
-        pattern=r"[\u4e00-\u9fa5]{2,10}(?:有限公司|股份有限公司|有限责任公司|集团|公司|企业|厂|店|行|中心|工作室|合伙企业|控股|科技|网络|信息|技术|贸易|商贸|实业|发展|建设|投资|管理|咨询|服务|教育|文化|传媒|电子|汽车|房地产|能源|化工|制造|物流|运输|建筑|装饰|设计|广告|餐饮|酒店|医院|学校|银行|保险|证券|基金)",
+        pattern=r"[\u4e00-\u9fa5]{2,10}(?:" + "|".join(_COMPANY_SUFFIXES) + ")",
         mode=MaskMode.PARTIAL,
         preserve_chars=0,  # 保留0位，完全脱敏公司名称
         mask_char="*",
+        prefilter=lambda text, has_digit: not _COMPANY_CHARS.isdisjoint(text),
         description="企业名称，完全脱敏公司名称，保留后缀"
     ),
     "详细地址": MaskPattern(
@@ -92,6 +132,7 @@ PREDEFINED_PATTERNS: Dict[str, MaskPattern] = {
         mode=MaskMode.PARTIAL,
         preserve_chars=3,
         mask_char="*",
+        prefilter=lambda text, has_digit: not _ADDRESS_MARKERS.isdisjoint(text),
         description="详细地址，保留前3位"
     ),
     "车牌号": MaskPattern(
@@ -100,6 +141,7 @@ PREDEFINED_PATTERNS: Dict[str, MaskPattern] = {
         mode=MaskMode.PARTIAL,
         preserve_chars=2,
         mask_char="*",
+        prefilter=lambda text, has_digit: not _PLATE_PREFIXES.isdisjoint(text),
         description="中国车牌号，保留前2位"
     ),
     "金额": MaskPattern(
@@ -108,86 +150,198 @@ PREDEFINED_PATTERNS: Dict[str, MaskPattern] = {
         mode=MaskMode.PARTIAL,
         preserve_chars=0,  # 金额完全脱敏
         mask_char="*",
+        prefilter=lambda text, has_digit: has_digit,
         description="金额数字，支持¥/$/USD等货币符号和千分位格式"
     ),
 }
 
 
+# 关键词分隔符：模块级预编译，连续分隔符一次吞掉，少产生空项
+_KW_SPLIT = re.compile(r"[\n\r,;，；]+")
+
+
 def normalize_keywords(raw: str) -> list:
     """解析关键词列表，支持换行、逗号、分号分隔"""
     if not raw:
         return []
-    return [item.strip() for item in re.split(r"[\n,;，；]", raw) if item.strip()]
+    return [item for item in (piece.strip() for piece in _KW_SPLIT.split(raw)) if item]
+
+
+@lru_cache(maxsize=256)
+def _mask_str(mask_char: str, length: int) -> str:
+    """遮蔽串缓存：真实文本中长度集中在 1~50，缓存命中率极高"""
+    return mask_char * length
 
 
 def mask_text_full(text: str, keyword: str, mask_char: str = "*") -> str:
-    """全量替换模式"""
-    escaped = re.escape(keyword)
-    return re.sub(escaped, mask_char * len(keyword), text)
+    """全量替换模式
+
+    关键词是字面量，str.replace 的 C 实现比正则引擎快得多。
+    """
+    return text.replace(keyword, _mask_str(mask_char, len(keyword)))
 
 
 def mask_text_partial(text: str, keyword: str, preserve_chars: int = 1, mask_char: str = "*") -> str:
     """部分遮蔽模式：保留前N位，其余用*替换"""
-    escaped = re.escape(keyword)
+    if len(keyword) <= preserve_chars:
+        return text
+    # 字面量关键词的替换串固定，可走 str.replace 快路径
+    replacement = keyword[:preserve_chars] + mask_char * (len(keyword) - preserve_chars)
+    return text.replace(keyword, replacement)
 
-    def replacement(match):
-        original = match.group(0)
-        if len(original) <= preserve_chars:
-            return original
-        return original[:preserve_chars] + mask_char * (len(original) - preserve_chars)
 
-    return re.sub(escaped, replacement, text)
+# Aho-Corasick 自动机缓存：同一批关键词只构建一次
+_AC_CACHE: Dict[frozenset, object] = {}
 
 
-def mask_text_regex(text: str, pattern: str, preserve_chars: int = 0, mask_char: str = "*") -> tuple:
-    """正则匹配模式"""
-    match_count = 0
+def _automaton_spans(text: str, keywords_key: frozenset) -> list:
+    """用 C 自动机收集关键词命中区间 [(start, end, word), ...]
 
-    def replacement(match):
-        nonlocal match_count
-        match_count += 1
-        original = match.group(0)
+    自动机会报告所有重叠命中，这里只排序不去重（按起点升序、
+    同起点长词在前），由消费方按扫描位置跳过被覆盖的区间——
+    这样前一个命中被其他来源盖掉时，后面的重叠命中仍有机会。
+    仅在装了 pyahocorasick 时调用。
+    """
+    automaton = _AC_CACHE.get(keywords_key)
+    if automaton is None:
+        automaton = ahocorasick.Automaton()
+        for word in keywords_key:
+            automaton.add_word(word, word)
+        automaton.make_automaton()
+        _AC_CACHE[keywords_key] = automaton
+
+    candidates = []
+    for end, word in automaton.iter(text):
+        start = end - len(word) + 1
+        candidates.append((start, end + 1, word))
+
+    candidates.sort(key=lambda span: (span[0], span[0] - span[1]))
+    return candidates
 
-        # 特殊处理：企业名称脱敏，保留后缀
-        if preserve_chars == 0 and "公司" in original or "企业" in original:
-            # 找到后缀位置
-            suffixes = [
-                "股份有限公司", "有限公司", "有限责任公司",
-                "集团有限公司", "公司", "企业", "集团"
-            ]
 
-            for suffix in suffixes:
-                if original.endswith(suffix):
-                    # 只脱敏公司名称部分，保留后缀
-                    name_part = original[:-len(suffix)]
-                    suffix_part = suffix
-                    return mask_char * len(name_part) + suffix_part
+# 用户自定义正则的编译缓存
+_compile_pattern = lru_cache(maxsize=128)(re.compile)
 
-        # 普通处理
-        if len(original) <= preserve_chars:
-            return original
-        return original[:preserve_chars] + mask_char * (len(original) - preserve_chars)
 
-    masked = re.sub(pattern, replacement, text)
-    return masked, match_count
+def mask_text_regex(text: str, pattern, preserve_chars: int = 0, mask_char: str = "*") -> tuple:
+    """正则匹配模式（pattern 可以是字符串或已编译的正则）"""
+    if not isinstance(pattern, re.Pattern):
+        pattern = _compile_pattern(pattern)
+    return mask_text_regex_compiled(pattern, text, preserve_chars, mask_char)
+
+
+# 企业名称后缀，锚定结尾、长后缀在前保证优先匹配
+_SUFFIX_RE = re.compile(
+    r"(?:股份有限公司|有限责任公司|集团有限公司|有限公司|公司|企业|集团)$"
+)
+
+
+def _mask_segment(original: str, preserve_chars: int, mask_char: str) -> str:
+    """根据保留位数计算单个匹配片段的脱敏结果"""
+    # 特殊处理：企业名称脱敏，只脱敏名称部分、保留后缀。
+    # 原实现的布尔条件有优先级错误（and/or 未加括号），导致
+    # preserve_chars != 0 时含"企业"的片段也会走到这里；
+    # 现在由锚定后缀的正则一次判断，未命中自然落到普通处理
+    if preserve_chars == 0:
+        suffix = _SUFFIX_RE.search(original)
+        if suffix is not None:
+            return _mask_str(mask_char, suffix.start()) + suffix.group(0)
+
+    # 普通处理
+    if len(original) <= preserve_chars:
+        return original
+    return original[:preserve_chars] + _mask_str(mask_char, len(original) - preserve_chars)
+
+
+def mask_text_regex_compiled(compiled: re.Pattern, text: str, preserve_chars: int = 0, mask_char: str = "*") -> tuple:
+    """正则匹配模式（使用预编译正则）
+
+    用 finditer 收集区间后切片拼接，替代 sub 的逐匹配回调：
+    每个匹配省掉一次闭包调用和 nonlocal 计数器操作。
+    """
+    parts = []
+    pos = 0
+    match_count = 0
+    for match in compiled.finditer(text):
+        match_count += 1
+        parts.append(text[pos:match.start()])
+        parts.append(_mask_segment(match.group(0), preserve_chars, mask_char))
+        pos = match.end()
+
+    if not parts:
+        return text, match_count
+    parts.append(text[pos:])
+    return "".join(parts), match_count
 
 
 def apply_smart_detection(text: str) -> tuple:
-    """智能识别常见敏感信息并脱敏"""
-    stats = {}
-    result = text
-
-    for name, pattern in PREDEFINED_PATTERNS.items():
-        result, count = mask_text_regex(
-            result,
-            pattern.pattern,
-            pattern.preserve_chars,
-            pattern.mask_char
+    """智能识别常见敏感信息并脱敏
+
+    所有模式在模块加载时融合为一个带命名分组的交替正则
+    （见 _build_union_engine），整篇文本只扫描一遍。
+    """
+    # 数字检查被多个模式共享，整体只做一次；
+    # 没有任何模式可能命中时直接跳过融合扫描
+    has_digit = any(ch.isdigit() for ch in text)
+    if not any(
+        pattern.prefilter is None or pattern.prefilter(text, has_digit)
+        for pattern in PREDEFINED_PATTERNS.values()
+    ):
+        return text, {}
+
+    masked, stats = build_masked_text(text, [], enable_smart=True)
+    return masked, stats["smart_detection"]
+
+
+def _keyword_replacement(word: str, mask_mode: MaskMode, preserve_chars: int, mask_char: str) -> str:
+    """关键词在指定模式下的固定替换串"""
+    if mask_mode == MaskMode.PARTIAL:
+        if len(word) <= preserve_chars:
+            return word
+        return word[:preserve_chars] + mask_char * (len(word) - preserve_chars)
+    return mask_char * len(word)
+
+
+# 关键词+智能识别联合正则缓存：同一组参数只构建一次
+_UNION_CACHE: Dict[tuple, tuple] = {}
+
+
+def _build_union_engine(
+    keywords: tuple,
+    mask_mode: MaskMode,
+    preserve_chars: int,
+    mask_char: str,
+    enable_smart: bool
+) -> tuple:
+    """构建关键词与智能识别模式的联合交替正则
+
+    返回 (编译后的正则, 分组名 -> 处理方式映射)。
+    关键词分支在前，保证与先关键词后智能识别的串行语义一致。
+    """
+    key = (keywords, mask_mode, preserve_chars, mask_char, enable_smart)
+    entry = _UNION_CACHE.get(key)
+    if entry is not None:
+        return entry
+
+    branches = []
+    handlers = {}  # 分组名 -> (固定替换串, 智能模式)，二者互斥
+
+    for index, word in enumerate(sorted(keywords, key=len, reverse=True)):
+        group = f"kw{index}"
+        branches.append(f"(?P<{group}>{re.escape(word)})")
+        handlers[group] = (
+            _keyword_replacement(word, mask_mode, preserve_chars, mask_char), None
         )
-        if count > 0:
-            stats[name] = count
 
-    return result, stats
+    if enable_smart:
+        for index, pattern in enumerate(PREDEFINED_PATTERNS.values()):
+            group = f"g{index}"
+            branches.append(f"(?P<{group}>{pattern.pattern})")
+            handlers[group] = (None, pattern)
+
+    combined = re.compile("|".join(branches)) if branches else None
+    entry = _UNION_CACHE[key] = (combined, handlers)
+    return entry
 
 
 def build_masked_text(
@@ -198,22 +352,119 @@ def build_masked_text(
     mask_char: str = "*",
     enable_smart: bool = False
 ) -> tuple:
-    """构建脱敏文本"""
-    masked = text
+    """构建脱敏文本
+
+    关键词替换与智能识别合并为一个交替正则，整篇文本只扫描一遍。
+    """
     stats = {"manual_keywords": len(keywords), "smart_detection": {}}
 
-    # 应用手动关键词脱敏
-    if keywords:
-        if mask_mode == MaskMode.FULL:
-            for word in keywords:
-                masked = mask_text_full(masked, word, mask_char)
-        elif mask_mode == MaskMode.PARTIAL:
-            for word in keywords:
-                masked = mask_text_partial(masked, word, preserve_chars, mask_char)
+    union_keywords = tuple(keywords) if mask_mode in (MaskMode.FULL, MaskMode.PARTIAL) else ()
+
+    # 装了 pyahocorasick 时关键词走 C 自动机（扫描成本与关键词数量
+    # 无关），与智能识别的命中区间归并后一次拼接成稿
+    if ahocorasick is not None and union_keywords:
+        return _build_masked_text_spans(
+            text, union_keywords, mask_mode, preserve_chars, mask_char,
+            enable_smart, stats
+        )
 
-    # 应用智能识别
+    combined, handlers = _build_union_engine(
+        union_keywords, mask_mode, preserve_chars, mask_char, enable_smart
+    )
+    if combined is None:
+        return text, stats
+
+    smart_counts = {}
+    parts = []
+    pos = 0
+    for match in combined.finditer(text):
+        # 智能模式内部含无名分组，lastgroup 不可靠时回退到逐组探测
+        group = match.lastgroup
+        if group not in handlers:
+            group = next(
+                name for name in handlers if match.group(name) is not None
+            )
+        replacement, pattern = handlers[group]
+        if pattern is not None:
+            replacement = _mask_segment(
+                match.group(0), pattern.preserve_chars, pattern.mask_char
+            )
+            smart_counts[pattern.name] = smart_counts.get(pattern.name, 0) + 1
+        parts.append(text[pos:match.start()])
+        parts.append(replacement)
+        pos = match.end()
+
+    stats["smart_detection"] = smart_counts
+    if not parts:
+        return text, stats
+    parts.append(text[pos:])
+    return "".join(parts), stats
+
+
+def _build_masked_text_spans(
+    text: str,
+    keywords: tuple,
+    mask_mode: MaskMode,
+    preserve_chars: int,
+    mask_char: str,
+    enable_smart: bool,
+    stats: dict
+) -> tuple:
+    """自动机 + 智能识别的交错扫描路径
+
+    关键词命中由 C 自动机一次线性扫描给出，智能识别命中由融合
+    正则按需向后搜索；每一步取起点靠前者（同起点关键词优先，对应
+    交替正则里关键词分支在前），采纳后从其末尾继续。语义与纯正则
+    的联合交替路径完全一致——被前一个命中覆盖的区域不会产生命中，
+    之后的文本照常继续匹配。
+    """
+    kw_spans = _automaton_spans(text, frozenset(keywords))
+    kw_idx = 0
+    combined = handlers = None
     if enable_smart:
-        masked, smart_stats = apply_smart_detection(masked)
-        stats["smart_detection"] = smart_stats
+        combined, handlers = _build_union_engine(
+            (), mask_mode, preserve_chars, mask_char, True
+        )
+
+    smart_counts = {}
+    parts = []
+    pos = 0
+    while True:
+        while kw_idx < len(kw_spans) and kw_spans[kw_idx][0] < pos:
+            kw_idx += 1
+        kw = kw_spans[kw_idx] if kw_idx < len(kw_spans) else None
+        match = combined.search(text, pos) if combined is not None else None
+
+        if kw is not None and (match is None or kw[0] <= match.start()):
+            start, end, word = kw
+            replacement = _keyword_replacement(word, mask_mode, preserve_chars, mask_char)
+            kw_idx += 1
+        elif match is not None:
+            # 智能模式内部含无名分组，lastgroup 不可靠时回退到逐组探测
+            group = match.lastgroup
+            if group not in handlers:
+                group = next(
+                    name for name in handlers if match.group(name) is not None
+                )
+            _, pattern = handlers[group]
+            start, end = match.span()
+            replacement = _mask_segment(
+                match.group(0), pattern.preserve_chars, pattern.mask_char
+            )
+            smart_counts[pattern.name] = smart_counts.get(pattern.name, 0) + 1
+        else:
+            break
+
+        parts.append(text[pos:start])
+        parts.append(replacement)
+        pos = end
+
+    stats["smart_detection"] = smart_counts
+    if not parts:
+        return text, stats
+    parts.append(text[pos:])
+    return "".join(parts), stats
+
 
-    return masked, stats
+# 模块加载时预构建智能识别的融合正则，首次调用不付编译开销
+_build_union_engine((), MaskMode.FULL, 1, "*", True)
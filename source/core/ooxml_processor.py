@@ -4,12 +4,23 @@
 """
 
 import re
+from functools import lru_cache
+from itertools import accumulate
 from typing import List, Dict, Tuple, Optional
 from docx import Document
 from docx.text.paragraph import Run
 from dataclasses import dataclass
 from lxml import etree
 
+try:
+    # C 实现的多模式匹配自动机：一次线性扫描命中所有关键词
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# <w:t> 带边缘空白时需要 xml:space="preserve"，否则 Word 会吞掉空白
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
 
 @dataclass
 class TextReplacement:
@@ -22,6 +33,111 @@ class TextReplacement:
     use_equal_length: bool = True
 
 
+# 全角字符（中文、全角标点）→ 全角方块 █ 的 translate 映射，
+# 半角字符经 __missing__ 落到掩码字符；映射表按掩码字符缓存
+_FULL_WIDTH_MAP = {cp: "█" for cp in range(0x4E00, 0xA000)}
+_FULL_WIDTH_MAP.update({ord(c): "█" for c in '，。、；：""\'\'（）【】《》'})
+
+
+class _PlaceholderTable(dict):
+    """str.translate 映射表：表内字符按映射替换，其余字符统一映射为掩码字符"""
+
+    def __init__(self, mask_char: str):
+        super().__init__(_FULL_WIDTH_MAP)
+        self._mask_char = mask_char
+
+    def __missing__(self, codepoint):
+        return self._mask_char
+
+
+_PLACEHOLDER_TABLES: Dict[str, _PlaceholderTable] = {}
+
+
+def _placeholder_table(mask_char: str) -> _PlaceholderTable:
+    table = _PLACEHOLDER_TABLES.get(mask_char)
+    if table is None:
+        table = _PLACEHOLDER_TABLES[mask_char] = _PlaceholderTable(mask_char)
+    return table
+
+
+@lru_cache(maxsize=4096)
+def _placeholder(original: str, mask_char: str) -> str:
+    """等长占位符（带记忆化）
+
+    同一批 PII 值（关键词、反复出现的手机号/公司名）在一份文档里
+    往往出现多次，重复命中直接走字典查找。
+    """
+    return original.translate(_placeholder_table(mask_char))
+
+
+@dataclass
+class FusedEngine:
+    """合并后的替换引擎：单个命名分组大正则 + 各分组的掩码字符"""
+    combined: Optional[re.Pattern]
+    mask_chars: Dict[str, str]
+    direct_rules: List[Tuple[re.Pattern, str]]
+    # 触发字符集：内置规则要命中，文本中至少要出现其中一个字符；
+    # None 表示不做预过滤
+    trigger_chars: Optional[frozenset] = None
+    # 关键词的 Aho-Corasick 自动机（pyahocorasick 可用时），
+    # None 表示关键词走大正则分支
+    automaton: Optional[object] = None
+    # 企业名称分支的分组名（保留后缀的特殊处理），None 表示未启用
+    company_group: Optional[str] = None
+    # 分组名 → 统计类别（如 "手机号"），None 表示不计入统计
+    labels: Dict[str, Optional[str]] = None
+
+
+# 内置智能规则的触发字符：数字（手机号/身份证/银行卡/IP/信用代码/金额）、
+# @（邮箱）、货币符号（金额）、地址后缀字、车牌省份前缀字
+_RULE_TRIGGER_CHARS = frozenset(
+    "0123456789@¥￥$"
+    "省市区县镇乡街道路巷号栋单元楼层室户"
+    "京津沪渝冀豫云辽黑湘皖鲁新苏浙赣鄂桂甘晋蒙陕吉闽贵粤青藏川宁琼使领"
+)
+
+
+def _fuse_replacements(
+    replacements: List[Tuple[re.Pattern, str, bool]],
+    trigger_chars: Optional[frozenset] = None,
+    automaton: Optional[object] = None,
+    company_pattern: Optional[re.Pattern] = None,
+) -> FusedEngine:
+    """把等长替换规则合并为一个命名分组的交替正则
+
+    正则引擎单遍扫描即可命中所有规则，代替逐条规则各扫一遍文本；
+    非等长规则数量极少，保持原有的逐条 sub 方式。
+    企业名称作为末位分支并入同一正则，免去整棵文档树的第二遍遍历。
+    """
+    branches = []
+    mask_chars = {}
+    direct_rules = []
+    labels = {}
+    for pattern, mask_char, use_equal_length, label in replacements:
+        if use_equal_length:
+            name = f"g{len(mask_chars)}"
+            branches.append(f"(?P<{name}>{pattern.pattern})")
+            mask_chars[name] = mask_char
+            labels[name] = label
+        else:
+            direct_rules.append((pattern, mask_char))
+    company_group = None
+    if company_pattern is not None:
+        company_group = "company"
+        branches.append(f"(?P<company>{company_pattern.pattern})")
+        labels[company_group] = "企业名称"
+    combined = re.compile("|".join(branches)) if branches else None
+    return FusedEngine(
+        combined=combined,
+        mask_chars=mask_chars,
+        direct_rules=direct_rules,
+        trigger_chars=trigger_chars,
+        automaton=automaton,
+        company_group=company_group,
+        labels=labels,
+    )
+
+
 class OOXMLProcessor:
     """
     OOXML 文档处理器
@@ -34,129 +150,211 @@ class OOXMLProcessor:
             'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
         }
 
-    def process_document(self, replacements: List[Tuple[str, str, bool]]) -> Document:
+    def process_document(
+        self,
+        replacements: List[Tuple[re.Pattern, str, bool]],
+        trigger_chars: Optional[frozenset] = None,
+        automaton: Optional[object] = None,
+        company_pattern: Optional[re.Pattern] = None,
+        engine: Optional[FusedEngine] = None,
+        stats: Optional[Dict[str, int]] = None,
+    ) -> Document:
         """
         处理整个文档，应用所有替换规则
 
         Args:
-            replacements: 替换规则列表 [(pattern, replacement, use_equal_length), ...]
+            replacements: 替换规则列表
+                [(编译后正则, replacement, use_equal_length, 统计类别), ...]
+            trigger_chars: 触发字符集（可选）；段落文本不含任一触发字符时
+                整段跳过正则扫描
+            automaton: 关键词的 Aho-Corasick 自动机（可选）
+            company_pattern: 企业名称正则（可选）；命中时保留后缀、
+                名称部分等长脱敏
+            engine: 预构建的替换引擎（可选）；给出时忽略前述参数
+            stats: 统计计数器（可选）；给出时按规则类别累加命中次数
 
         Returns:
             处理后的文档
         """
-        # 处理正文段落
-        for paragraph in self.document.paragraphs:
-            self._process_paragraph(paragraph, replacements)
-
-        # 处理表格（包括嵌套表格）
-        for table in self.document.tables:
-            self._process_table(table, replacements)
-
-        # 处理页眉
-        for section in self.document.sections:
-            for paragraph in section.header.paragraphs:
-                self._process_paragraph(paragraph, replacements)
-            # 页眉中的表格
-            for table in section.header.tables:
-                self._process_table(table, replacements)
-
-        # 处理页脚
+        # 所有等长替换规则合并为一个命名分组的大正则：
+        # 每个段落只扫描一次文本，而不是每条规则各扫一遍
+        if engine is None:
+            engine = _fuse_replacements(replacements, trigger_chars, automaton, company_pattern)
+        w_p = f"{{{self.ns['w']}}}p"
+
+        # 直接遍历底层 XML 树：python-docx 的 paragraphs/tables/runs
+        # 属性每次访问都要构造包装对象，是大文档的主要开销；
+        # body.iter 一次 C 层遍历即覆盖正文与（嵌套）表格中的全部段落
+        roots = [self.document.element.body]
+
+        # 页眉页脚（多个节可能共享同一部件，按部件去重）
+        processed_parts = set()
         for section in self.document.sections:
-            for paragraph in section.footer.paragraphs:
-                self._process_paragraph(paragraph, replacements)
-            # 页脚中的表格
-            for table in section.footer.tables:
-                self._process_table(table, replacements)
+            for header_footer in (section.header, section.footer):
+                if header_footer.is_linked_to_previous:
+                    continue  # 无独立部件，沿用前一节的（该部件另行处理）
+                part = header_footer.part
+                if id(part) in processed_parts:
+                    continue
+                processed_parts.add(id(part))
+                roots.append(part.element)
+
+        # 脚注/尾注/批注部件：python-docx 不建模（只保留原始字节），
+        # 这里自行解析并参与同一遍处理，结束后序列化写回部件
+        blob_parts = []
+        for part in self.document.part.package.iter_parts():
+            partname = str(part.partname)
+            if partname.endswith(
+                ("/footnotes.xml", "/endnotes.xml", "/comments.xml")
+            ) and not hasattr(part, "element"):
+                root = etree.fromstring(part.blob)
+                blob_parts.append((part, root))
+                roots.append(root)
+
+        # 收集所有待处理段落：脱敏是纯文本函数，批量计算与逐段计算
+        # 结果相同，但批量只需一次正则扫描启动
+        entries = []
+        for root in roots:
+            for paragraph in root.iter(w_p):
+                t_elems = paragraph.findall('.//w:t', self.ns)
+                if not t_elems:
+                    continue
+
+                texts = [t.text or '' for t in t_elems]
+                full_text = ''.join(texts)
+                if not full_text:
+                    continue
+
+                # 预过滤：不含任何触发字符的段落（普通叙述文本的大多数）
+                # 直接跳过，frozenset 的 C 层字符集查找远比正则扫描便宜
+                if (
+                    engine.trigger_chars is not None
+                    and not engine.direct_rules
+                    and engine.trigger_chars.isdisjoint(full_text)
+                ):
+                    continue
+
+                entries.append((t_elems, texts, full_text))
+
+        if not entries:
+            return self.document
+
+        # 批量脱敏：所有段落文本用 \x00 连接后对整份文档只扫描一次。
+        # 规则都不可能匹配到 \x00（对 \b 而言它等价于文本边界），
+        # 且等长替换不改变长度，分隔符位置保持稳定
+        joined = "\x00".join(entry[2] for entry in entries)
+        masked_parts = self._mask_text(joined, engine, stats).split("\x00")
+
+        for (t_elems, texts, full_text), masked_text in zip(entries, masked_parts):
+            self._write_text_to_elems(t_elems, texts, full_text, masked_text)
+
+        # 解析出来的树独立于部件字节，改动需要序列化回去才会落盘
+        for part, root in blob_parts:
+            part._blob = etree.tostring(
+                root, xml_declaration=True, encoding="UTF-8", standalone=True
+            )
 
         return self.document
 
-    def _process_paragraph(self, paragraph, replacements: List[Tuple[str, str, bool]]):
+    def _mask_text(
+        self,
+        full_text: str,
+        engine: "FusedEngine",
+        stats: Optional[Dict[str, int]] = None,
+    ) -> str:
         """
-        处理单个段落，在 Run 级别进行文本替换
+        对一段文本应用全部替换规则，返回脱敏后的文本
 
-        关键逻辑：
-        1. 合并段落中所有 Run 的文本
-        2. 在合并后的文本中查找需要替换的内容
-        3. 将替换结果写回原始的 Run 结构中，保持样式
+        纯文本函数。常规路径（无关键词自动机）直接用大正则的 sub
+        一趟完成匹配与替换，无 Python 侧位置簿记；自动机与正则两路
+        并存时收集命中区间，按切片拼接一次生成结果。
         """
-        # 收集所有 Run 的文本和样式信息
-        runs_data = []
-        full_text = ""
-
-        for run in paragraph.runs:
-            run_text = run.text
-            runs_data.append({
-                'run': run,
-                'text': run_text,
-                'length': len(run_text)
-            })
-            full_text += run_text
-
-        if not full_text:
-            return
-
-        # 在完整文本中应用所有替换规则
         masked_text = full_text
-        replacement_map = []  # 记录所有替换的位置
 
-        for pattern, replacement_char, use_equal_length in replacements:
-            if use_equal_length:
-                # 等长替换策略
-                matches = re.finditer(pattern, full_text)
-                for match in reversed(list(matches)):  # 从后往前替换，避免位置偏移
-                    start, end = match.span()
-                    original = match.group()
-
-                    # 创建等长占位符
-                    placeholder = self._create_equal_length_placeholder(
-                        original, replacement_char
-                    )
-
-                    replacement_map.append(TextReplacement(
-                        start=start,
-                        end=end,
-                        original=original,
-                        replacement=placeholder,
-                        use_equal_length=True
-                    ))
-            else:
+        if engine.automaton is None:
+            if engine.combined is not None:
+                masked_text = engine.combined.sub(
+                    lambda m: self._match_replacement(m, engine, stats), masked_text
+                )
+            for pattern, replacement_char in engine.direct_rules:
                 # 直接替换
-                masked_text = re.sub(pattern, lambda m: replacement_char * len(m.group()), masked_text)
+                masked_text = pattern.sub(
+                    lambda m: replacement_char * len(m.group()), masked_text
+                )
+            return masked_text
+
+        replacement_map = []  # 记录所有替换的位置
+
+        # 关键词：自动机一次线性扫描命中所有出现位置
+        for end, keyword in engine.automaton.iter(full_text):
+            start = end - len(keyword) + 1
+            replacement_map.append(TextReplacement(
+                start=start,
+                end=end + 1,
+                original=keyword,
+                replacement=self._create_equal_length_placeholder(keyword, "*"),
+                use_equal_length=True
+            ))
+
+        if engine.combined is not None:
+            # 等长替换策略：单遍扫描，按命中的命名分组取对应掩码字符
+            for match in engine.combined.finditer(full_text):
+                replacement_map.append(TextReplacement(
+                    start=match.start(),
+                    end=match.end(),
+                    original=match.group(),
+                    replacement=self._match_replacement(match, engine, stats),
+                    use_equal_length=True
+                ))
+
+        for pattern, replacement_char in engine.direct_rules:
+            # 直接替换
+            masked_text = pattern.sub(lambda m: replacement_char * len(m.group()), masked_text)
 
         # 如果有等长替换，需要精确应用
         if replacement_map:
-            # 按位置排序
-            replacement_map.sort(key=lambda x: x.start)
-
-            # 构建最终文本
+            # 自动机与正则两路命中合并后需要重新排序；
+            # 同一起点取最长命中，重叠由 _apply_replacements 过滤
+            replacement_map.sort(key=lambda x: (x.start, x.start - x.end))
             masked_text = self._apply_replacements(full_text, replacement_map)
 
-        # 将处理后的文本写回 Run 结构
-        self._write_text_to_runs(paragraph, runs_data, full_text, masked_text)
-
-    def _process_table(self, table, replacements: List[Tuple[str, str, bool]]):
-        """
-        处理表格（包括嵌套表格）
-
-        Args:
-            table: Word 表格对象
-            replacements: 替换规则列表
-        """
-        for row in table.rows:
-            for cell in row.cells:
-                # 处理单元格中的段落
-                for paragraph in cell.paragraphs:
-                    self._process_paragraph(paragraph, replacements)
-
-                # 递归处理嵌套表格
-                for nested_table in cell.tables:
-                    self._process_table(nested_table, replacements)
+        return masked_text
+
+    def _match_replacement(
+        self,
+        match,
+        engine: "FusedEngine",
+        stats: Optional[Dict[str, int]] = None,
+    ) -> str:
+        """计算大正则单个命中的替换文本，顺带累加该类别的统计"""
+        group = match.lastgroup
+        if group not in engine.mask_chars and group != engine.company_group:
+            # 分支内部含未命名分组时 lastgroup 不可靠，逐分组探测
+            group = next(
+                name for name in (*engine.mask_chars, engine.company_group)
+                if name is not None and match.group(name) is not None
+            )
+        original = match.group()
+
+        if stats is not None:
+            label = engine.labels.get(group) if engine.labels else None
+            if label:
+                stats[label] = stats.get(label, 0) + 1
+
+        if group == engine.company_group:
+            # 企业名称：保留后缀，名称部分等长脱敏
+            return _mask_company_name(original)
+        return self._create_equal_length_placeholder(
+            original, engine.mask_chars[group]
+        )
 
     def _create_equal_length_placeholder(self, original: str, mask_char: str = "█") -> str:
         """
         创建等长占位符，保持布局稳定
 
-        使用全角字符或特殊 Unicode 字符来保持视觉宽度
+        使用全角字符或特殊 Unicode 字符来保持视觉宽度：
+        全角字符（中文、全角标点）映射为全角方块 █，其余映射为掩码字符。
+        str.translate 在 C 层单遍完成整串映射，替代逐字符的 Python 循环。
 
         Args:
             original: 原始文本
@@ -165,25 +363,7 @@ class OOXMLProcessor:
         Returns:
             与原始文本等长的占位符
         """
-        # 分析原始文本的字符类型
-        full_width_chars = 0
-        half_width_chars = 0
-
-        for char in original:
-            # 判断是否为全角字符（中文、全角标点等）
-            if '\u4e00' <= char <= '\u9fff' or char in '，。、；：""''（）【】《》':
-                full_width_chars += 1
-            else:
-                half_width_chars += 1
-
-        # 创建等长占位符
-        # 使用全角方块字符（U+2588）作为全角占位符
-        # 使用普通星号作为半角占位符
-        placeholder = ""
-        placeholder += "█" * full_width_chars  # 全角占位符
-        placeholder += "*" * half_width_chars  # 半角占位符
-
-        return placeholder
+        return _placeholder(original, mask_char)
 
     def _apply_replacements(self, text: str, replacements: List[TextReplacement]) -> str:
         """
@@ -196,76 +376,155 @@ class OOXMLProcessor:
         Returns:
             替换后的文本
         """
-        # 转换为列表以便修改
-        result = list(text)
-
-        # 从后往前应用替换（避免位置偏移）
-        for repl in reversed(replacements):
-            # 替换文本
-            for i in range(repl.start, repl.end):
-                if i < len(result):
-                    # 计算在 replacement 中的位置
-                    pos_in_replacement = i - repl.start
-                    if pos_in_replacement < len(repl.replacement):
-                        result[i] = repl.replacement[pos_in_replacement]
-
-        return ''.join(result)
-
-    def _write_text_to_runs(self, paragraph, runs_data: List[Dict], original_text: str, masked_text: str):
+        # 按区间切片拼接：未命中的片段整段引用原文，命中处插入占位符，
+        # 最后一次 join 完成拼装，避免逐字符的 Python 级赋值循环
+        parts = []
+        pos = 0
+        for repl in replacements:
+            if repl.start < pos:
+                continue  # 与前一个替换重叠，保留先到者
+            parts.append(text[pos:repl.start])
+            parts.append(repl.replacement)
+            pos = repl.end
+        parts.append(text[pos:])
+        return ''.join(parts)
+
+    def _write_text_to_elems(self, t_elems, texts, original_text: str, masked_text: str):
         """
-        将处理后的文本写回 Run 结构，保持样式
+        将处理后的文本写回 <w:t> 节点，保持样式
 
-        这是关键逻辑：需要智能地分配文本到各个 Run，保持样式不变
+        直接给 lxml 节点的 .text 赋值，绕开 python-docx 的
+        run.text 属性（其 setter 每次都要查找/重建 <w:t> 子节点）。
 
         Args:
-            paragraph: 段落对象
-            runs_data: Run 数据列表（包含原始文本和 Run 对象）
+            t_elems: 段落下的 <w:t> 节点列表
+            texts: 各节点的原始文本
             original_text: 原始完整文本
             masked_text: 处理后的完整文本
         """
+        # 多数段落没有命中任何规则，一次 C 层字符串比较即可整段跳过
+        if masked_text == original_text:
+            return
+
         # 如果长度差异太大（等长替换应该保持长度一致），需要特殊处理
         if len(original_text) != len(masked_text):
-            # 长度不一致，无法保持精确的 Run 结构
-            # 使用备用策略：清空所有 Run，在第一个 Run 中放入完整文本
-            if paragraph.runs:
-                # 保存第一个 Run 的样式
-                first_run = paragraph.runs[0]
-                # 清空所有 Run
-                for run in paragraph.runs:
-                    run.text = ""
-                # 在第一个 Run 中设置完整文本
-                first_run.text = masked_text
+            # 长度不一致，无法保持精确的节点结构：
+            # 清空所有节点，把完整文本放入第一个节点
+            for t in t_elems:
+                t.text = ""
+            t_elems[0].text = masked_text
+            if masked_text[:1].isspace() or masked_text[-1:].isspace():
+                t_elems[0].set(_XML_SPACE, "preserve")
             return
 
-        # 长度一致，精确分配文本到各个 Run
-        current_pos = 0
+        # 长度一致，按原有长度精确切分回各节点；
+        # 边界一次累加算好，循环体只剩切片和赋值
+        bounds = [0]
+        bounds.extend(accumulate(len(text) for text in texts))
+        for t, start, end in zip(t_elems, bounds, bounds[1:]):
+            piece = masked_text[start:end]
+            t.text = piece
+            if piece[:1].isspace() or piece[-1:].isspace():
+                t.set(_XML_SPACE, "preserve")
+
+
+# 智能识别规则（模块加载时编译一次，避免逐段落重复编译/查缓存）
+_SMART_RULES: List[Tuple[re.Pattern, str, bool, str]] = [
+    # 手机号 - 等长替换
+    (re.compile(r"1[3-9]\d{9}"), "*", True, "手机号"),
+    # 身份证号 - 等长替换
+    (re.compile(
+        r"[1-9]\d{5}(18|19|20)\d{2}(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])\d{3}[\dXx]"
+    ), "*", True, "身份证号"),
+    # 邮箱 - 等长替换
+    (re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b"), "*", True, "邮箱"),
+    # 银行卡号 - 等长替换
+    (re.compile(r"\b\d{16,19}\b"), "*", True, "银行卡号"),
+    # IP地址 - 等长替换
+    (re.compile(r"\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b"), "*", True, "IP地址"),
+    # 统一社会信用代码 - 等长替换
+    (re.compile(r"[0-9A-HJ-NPQRTUW-Y]{2}\d{6}[0-9A-HJ-NPQRTUW-Y]{10}"), "*", True, "统一社会信用代码"),
+    # 详细地址 - 等长替换
+    (re.compile(
+        r"[\u4e00-\u9fa5]{2,6}(?:省|市|区|县|镇|乡|街道|路|巷|号|栋|单元|楼|层|室|户)[\u4e00-\u9fa5\d\-#号]*"
+    ), "*", True, "详细地址"),
+    # 车牌号 - 等长替换
+    (re.compile(
+        r"[京津沪渝冀豫云辽黑湘皖鲁新苏浙赣鄂桂甘晋蒙陕吉闽贵粤青藏川宁琼使领][A-Z][A-Z0-9]{5,6}"
+    ), "*", True, "车牌号"),
+    # 金额 - 等长替换（完全脱敏）
+    (re.compile(
+        r"(?:¥|￥|USD?|\$)\s*(?:\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?)\s*(?:万元?|元)?|(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d{1,2})?\s*(?:万元?|元)"
+    ), "*", True, "金额"),
+]
+
+# 企业名称模式：匹配任意长度的企业名称（保留后缀的特殊处理使用）
+_COMPANY_RE = re.compile(
+    r"[\u4e00-\u9fa5a-zA-Z0-9()（）]{2,30}(?:有限公司|股份有限公司|有限责任公司|集团有限公司|公司)"
+)
+
+# 企业名称后缀的锚定正则（长后缀在前，一次 C 层匹配代替逐个 endswith）
+_COMPANY_SUFFIX_RE = re.compile(
+    r"(股份有限公司|有限责任公司|集团有限公司|有限公司|公司)$"
+)
 
-        for i, run_data in enumerate(runs_data):
-            run = run_data['run']
-            original_length = run_data['length']
 
-            if original_length == 0:
-                run.text = ""
-                continue
+def _mask_company_name(original: str) -> str:
+    """脱敏企业名称：名称部分用等长全角方块替换，后缀原样保留"""
+    suffix = _COMPANY_SUFFIX_RE.search(original)
+    if suffix is not None:
+        return "█" * suffix.start() + suffix.group(1)
+    # 没有匹配到后缀，完全脱敏
+    return "█" * len(original)
 
-            # 计算这个 Run 应该对应的文本范围
-            end_pos = current_pos + original_length
 
-            if end_pos > len(masked_text):
-                # 边界情况
-                run.text = masked_text[current_pos:]
-            else:
-                run.text = masked_text[current_pos:end_pos]
 
-            current_pos = end_pos
+@lru_cache(maxsize=32)
+def _build_keyword_engine(keywords: tuple, preserve_suffix: bool) -> FusedEngine:
+    """按 (关键词, 是否保留公司后缀) 构建替换引擎并缓存
+
+    批量流水线用同一套配置连续脱敏大量文档，自动机和正则的
+    构建/编译只需做一次；编译后的正则与自动机都是只读可复用的。
+    """
+    # 关键词匹配：pyahocorasick 可用时构建自动机（一次线性扫描命中
+    # 所有关键词），否则退回每个关键词一个正则分支
+    automaton = None
+    if ahocorasick is not None and keywords:
+        automaton = ahocorasick.Automaton()
+        for keyword in keywords:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        replacements = []
+    else:
+        # 长关键词优先，避免短关键词抢占长关键词的前缀
+        replacements = [
+            (re.compile(re.escape(keyword)), "*", True, None)
+            for keyword in sorted(keywords, key=len, reverse=True)
+        ]
+    replacements.extend(_SMART_RULES)
+
+    # 触发字符集：内置规则的触发字符 + 各关键词的首字符
+    trigger_chars = _RULE_TRIGGER_CHARS | {
+        keyword[0] for keyword in keywords if keyword
+    }
+    if preserve_suffix:
+        trigger_chars |= {"公", "司"}
+
+    return _fuse_replacements(
+        replacements,
+        trigger_chars,
+        automaton=automaton,
+        company_pattern=_COMPANY_RE if preserve_suffix else None,
+    )
 
 
 def apply_ooxml_masking(
     file_obj,
     keywords: List[str],
     mask_patterns: Dict[str, str],
-    preserve_suffix: bool = True
-) -> bytes:
+    preserve_suffix: bool = True,
+    preview_chars: int = 1000
+) -> tuple:
     """
     应用 OOXML 级别的脱敏处理
 
@@ -274,9 +533,12 @@ def apply_ooxml_masking(
         keywords: 关键词列表
         mask_patterns: 脱敏模式字典 {名称: 正则表达式}
         preserve_suffix: 是否保留公司后缀
+        preview_chars: 预览文本的最大字符数，0 表示不生成预览
 
     Returns:
-        处理后的 DOCX 文件字节
+        (处理后的 DOCX 文件字节, 统计信息字典, 预览文本)；统计结构与
+        build_masked_text 一致：{"manual_keywords": 关键词数,
+        "smart_detection": {类别: 命中次数}}
     """
     import io
 
@@ -286,165 +548,32 @@ def apply_ooxml_masking(
     # 创建处理器
     processor = OOXMLProcessor(document)
 
-    # 构建替换规则列表
-    replacements = []
-
-    # 添加关键词替换规则（使用等长占位符）
-    for keyword in keywords:
-        escaped = re.escape(keyword)
-        replacements.append((escaped, "*", True))
-
-    # 添加智能识别规则
-    # 手机号 - 等长替换
-    replacements.append((r"1[3-9]\d{9}", "*", True))
-
-    # 身份证号 - 等长替换
-    replacements.append((
-        r"[1-9]\d{5}(18|19|20)\d{2}(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])\d{3}[\dXx]",
-        "*",
-        True
-    ))
-
-    # 邮箱 - 等长替换
-    replacements.append((r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b", "*", True))
-
-    # 银行卡号 - 等长替换
-    replacements.append((r"\b\d{16,19}\b", "*", True))
-
-    # IP地址 - 等长替换
-    replacements.append((r"\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b", "*", True))
-
-    # 统一社会信用代码 - 等长替换
-    replacements.append((r"[0-9A-HJ-NPQRTUW-Y]{2}\d{6}[0-9A-HJ-NPQRTUW-Y]{10}", "*", True))
-
-    # 企业名称 - 特殊处理（保留后缀）
-    if preserve_suffix:
-        # 企业名称需要特殊处理，不在等长替换中处理
-        # 这个会在后面单独处理
-        pass
-
-    # 详细地址 - 等长替换
-    replacements.append((
-        r"[\u4e00-\u9fa5]{2,6}(?:省|市|区|县|镇|乡|街道|路|巷|号|栋|单元|楼|层|室|户)[\u4e00-\u9fa5\d\-#号]*",
-        "*",
-        True
-    ))
-
-    # 车牌号 - 等长替换
-    replacements.append((
-        r"[京津沪渝冀豫云辽黑湘皖鲁新苏浙赣鄂桂甘晋蒙陕吉闽贵粤青藏川宁琼使领][A-Z][A-Z0-9]{5,6}",
-        "*",
-        True
-    ))
-
-    # 金额 - 等长替换（完全脱敏）
-    replacements.append((
-        r"(?:¥|￥|USD?|\$)\s*(?:\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?)\s*(?:万元?|元)?|(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d{1,2})?\s*(?:万元?|元)",
-        "*",
-        True
-    ))
-
-    # 应用所有替换
-    processed_doc = processor.process_document(replacements)
-
-    # 特殊处理：企业名称脱敏（保留后缀）
-    # 这个需要在文档级别单独处理，因为涉及到后缀保留逻辑
-    if preserve_suffix:
-        _apply_company_masking(processed_doc)
+    # 应用所有替换（引擎按配置缓存，批量处理时只构建一次），
+    # 顺带在同一遍扫描里按类别累加命中次数
+    engine = _build_keyword_engine(tuple(sorted(keywords)), preserve_suffix)
+    smart_counts: Dict[str, int] = {}
+    processed_doc = processor.process_document([], engine=engine, stats=smart_counts)
+
+    # 预览直接取自已脱敏的 XML 树开头若干段落，
+    # 免去为了 500 字预览把整份 DOCX 再解压解析一遍
+    preview_parts = []
+    if preview_chars > 0:
+        total = 0
+        w_p = f"{{{processor.ns['w']}}}p"
+        w_t = f"{{{processor.ns['w']}}}t"
+        for paragraph in processed_doc.element.body.iter(w_p):
+            # 注意不能用 itertext()：python-docx 的元素类在 w:p/w:r 上
+            # 都重载了 .text，itertext 会把同一段文本重复收集多次
+            text = "".join(t.text for t in paragraph.iter(w_t) if t.text)
+            preview_parts.append(text)
+            total += len(text) + 1
+            if total >= preview_chars:
+                break
+    preview = "\n".join(preview_parts)[:preview_chars]
 
     # 保存到字节流
     buffer = io.BytesIO()
     processed_doc.save(buffer)
     buffer.seek(0)
-    return buffer.read()
-
-
-def _apply_company_masking(document: Document):
-    """
-    对文档应用企业名称脱敏（保留后缀）
-
-    Args:
-        document: Word 文档对象
-    """
-    # 修正后的企业名称模式：匹配任意长度的企业名称
-    # 修改：使用更广泛的字符范围和更大的长度限制
-    company_pattern = re.compile(
-        r"[\u4e00-\u9fa5a-zA-Z0-9()（）]{2,30}(?:有限公司|股份有限公司|有限责任公司|集团有限公司|公司)"
-    )
-
-    # 定义后缀列表（从长到短排序，确保优先匹配长的后缀）
-    suffixes = [
-        "股份有限公司",
-        "有限责任公司",
-        "集团有限公司",
-        "有限公司",
-        "公司",
-    ]
-
-    def mask_company_name(match):
-        """脱敏企业名称，保留后缀"""
-        original = match.group(0)
-
-        # 找到后缀（从长到短尝试）
-        for suffix in suffixes:
-            if original.endswith(suffix):
-                name_part = original[:-len(suffix)]
-                suffix_part = suffix
-                # 使用等长占位符脱敏名称部分
-                # 注意：len() 返回字符数，对于中文字符是准确的
-                return "█" * len(name_part) + suffix_part
-
-        # 如果没有匹配到后缀，完全脱敏
-        return "█" * len(original)
-
-    # 处理所有文本内容
-    for paragraph in document.paragraphs:
-        new_text = company_pattern.sub(mask_company_name, paragraph.text)
-        if paragraph.runs:
-            # 保留第一个 Run 的样式
-            first_run = paragraph.runs[0]
-            for run in paragraph.runs:
-                run.text = ""
-            first_run.text = new_text
-
-    # 处理表格
-    for table in document.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for paragraph in cell.paragraphs:
-                    new_text = company_pattern.sub(mask_company_name, paragraph.text)
-                    if paragraph.runs:
-                        first_run = paragraph.runs[0]
-                        for run in paragraph.runs:
-                            run.text = ""
-                        first_run.text = new_text
-
-                # 处理嵌套表格
-                for nested_table in cell.tables:
-                    for nested_row in nested_table.rows:
-                        for nested_cell in nested_row.cells:
-                            for paragraph in nested_cell.paragraphs:
-                                new_text = company_pattern.sub(mask_company_name, paragraph.text)
-                                if paragraph.runs:
-                                    first_run = paragraph.runs[0]
-                                    for run in paragraph.runs:
-                                        run.text = ""
-                                    first_run.text = new_text
-
-    # 处理页眉页脚
-    for section in document.sections:
-        for paragraph in section.header.paragraphs:
-            new_text = company_pattern.sub(mask_company_name, paragraph.text)
-            if paragraph.runs:
-                first_run = paragraph.runs[0]
-                for run in paragraph.runs:
-                    run.text = ""
-                first_run.text = new_text
-
-        for paragraph in section.footer.paragraphs:
-            new_text = company_pattern.sub(mask_company_name, paragraph.text)
-            if paragraph.runs:
-                first_run = paragraph.runs[0]
-                for run in paragraph.runs:
-                    run.text = ""
-                first_run.text = new_text
+    stats = {"manual_keywords": len(keywords), "smart_detection": smart_counts}
+    return buffer.read(), stats, preview
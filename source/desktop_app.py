@@ -3,9 +3,11 @@
 本地安全处理，支持文件脱敏和加密还原
 """
 
+import io
+import json
 import os
-import threading
-from dataclasses import asdict
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from tkinter import filedialog
 
@@ -14,14 +16,15 @@ import customtkinter as ctk
 # 导入核心功能模块
 from core.masking import (
     MaskMode,
+    PREDEFINED_PATTERNS,
     normalize_keywords,
     build_masked_text,
 )
-from core.encryption import encrypt_text, decrypt_text
+from core.encryption import encrypt_text, decrypt_text, pack_result, clear_key_cache
 from core.file_handler import (
     extract_file_text,
     build_docx_bytes,
-    build_zip_bundle,
+    build_zip_bundle_into,
 )
 from core.enhanced_doc import (
     extract_docx_with_format,
@@ -31,28 +34,50 @@ from core.enhanced_doc import (
 from core.ooxml_processor import apply_ooxml_masking
 
 try:
-    from CTkMessagebox import CTkMessagebox
+    # C 实现的 JSON 解码，大还原文件的解析快数倍；未安装时退回标准库
+    import orjson
 except ImportError:
-    # 如果未安装 CTkMessagebox，使用默认的 messagebox
-    from tkinter import messagebox as TkMessagebox
+    orjson = None
 
+try:
+    from CTkMessagebox import CTkMessagebox
+except ImportError:
+    # 如果未安装 CTkMessagebox，使用默认的 messagebox。
+    # tkinter.messagebox 连带加载额外的 Tcl 模块，首次弹窗时再导入
     class CTkMessagebox:
         @staticmethod
         def show_error(parent, title, message):
-            TkMessagebox.showerror(title, message)
+            from tkinter import messagebox
+            messagebox.showerror(title, message)
 
         @staticmethod
         def show_success(parent, title, message):
-            TkMessagebox.showinfo(title, message)
+            from tkinter import messagebox
+            messagebox.showinfo(title, message)
 
         @staticmethod
         def show_warning(parent, title, message):
-            TkMessagebox.showwarning(title, message)
+            from tkinter import messagebox
+            messagebox.showwarning(title, message)
 
 
 class MaskingApp(ctk.CTk):
     """脱敏工具主窗口类"""
 
+    # 统计卡片 key → smart_detection 中的类别名；None 表示关键词计数
+    _STAT_MAP = (
+        ("keywords", None),
+        ("phone", "手机号"),
+        ("idcard", "身份证号"),
+        ("email", "邮箱"),
+        ("credit_code", "统一社会信用代码"),
+        ("company", "企业名称"),
+        ("address", "详细地址"),
+        ("bank_card", "银行卡号"),
+        ("license_plate", "车牌号"),
+        ("amount", "金额"),
+    )
+
     def __init__(self):
         super().__init__()
 
@@ -67,16 +92,42 @@ class MaskingApp(ctk.CTk):
 
         # 初始化数据
         self.current_file = None
+        self.current_basename = None  # 文件名及去扩展名的主干，加载时算好
+        self.current_stem = None
+        self.current_file_bytes = None  # 原始文件字节，OOXML 处理直接复用
         self.current_text = None
         self.current_paragraphs = None  # 新增：存储格式化的段落数据
         self.processing = False
         self.mask_mode = MaskMode.FULL
         self.preserve_chars = 1
-        self.bundle_bytes = None
+        self._bundle_source = None  # (脱敏文档字节, 加密还原载荷, 文件名戳)
+        # 进度条更新合并：工作线程多次提交，主线程每拍只刷最近一次
+        self._pending_progress = None
         self.use_enhanced_format = True  # 新增：是否使用增强格式处理
+        # 智能识别模式字典只依赖 PREDEFINED_PATTERNS，构建一次反复使用
+        self._predef_mask_patterns = {
+            name: pattern.pattern
+            for name, pattern in PREDEFINED_PATTERNS.items()
+        }
+
+        # 常驻单线程工作队列：免去每次点击新建线程的开销，
+        # 也天然串行化任务，避免两次脱敏并发执行
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mask-worker")
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
+        # 工作线程到主线程的回调队列：after(0, ...) 逐条走 Tcl 调度，
+        # 改为统一入队、主线程泵批量执行，且 Queue 跨线程天然安全
+        self._ui_queue = queue.Queue()
 
         # 构建UI
         self.setup_ui()
+        self.after(30, self._drain_ui)
+
+    def _on_close(self):
+        """关闭窗口：停掉常驻工作线程、清掉派生密钥缓存再销毁窗口"""
+        self._worker.shutdown(wait=False, cancel_futures=True)
+        clear_key_cache()
+        self.destroy()
 
     def setup_ui(self):
         """构建UI界面"""
@@ -388,11 +439,7 @@ class MaskingApp(ctk.CTk):
         return column
 
     def create_stat_cards(self):
-        """创建统计卡片"""
-        # 清空现有内容
-        for widget in self.stats_frame.winfo_children():
-            widget.destroy()
-
+        """创建统计卡片（只在启动时构建一次，刷新用 update_stat_cards）"""
         # 3列布局，两行
         self.stats_frame.grid_columnconfigure((0, 1, 2), weight=1)
         self.stats_frame.grid_rowconfigure((0, 1), weight=1)
@@ -437,6 +484,14 @@ class MaskingApp(ctk.CTk):
 
             self.stat_labels[key] = value_label
 
+    def update_stat_cards(self, stats):
+        """刷新统计卡片：按映射表批量改标签文本，不销毁/重建任何控件"""
+        manual_count = stats.get("manual_keywords", 0)
+        smart_stats = stats.get("smart_detection", {})
+        for key, name in self._STAT_MAP:
+            value = manual_count if name is None else smart_stats.get(name, 0)
+            self.stat_labels[key].configure(text=str(value))
+
     def create_right_column(self, parent):
         """创建右列面板"""
         column = ctk.CTkFrame(parent)
@@ -553,35 +608,44 @@ class MaskingApp(ctk.CTk):
             # 在后台线程读取文件
             def read_file():
                 try:
+                    # 只读一次磁盘，原始字节留给后续 OOXML 处理复用
                     with open(file_path, 'rb') as f:
-                        # 判断文件类型
-                        if file_path.lower().endswith('.docx'):
-                            # 使用增强格式提取
-                            paragraphs_data = extract_docx_with_format(f)
-                            text = "\n".join([p.text for p in paragraphs_data])
-                            self.after(0, lambda: self.on_file_loaded_with_format(text, file_path, paragraphs_data))
-                        else:
-                            # 普通文本提取
-                            text = extract_file_text(f)
-                            self.after(0, lambda: self.on_file_loaded(text, file_path))
+                        raw = f.read()
+                    # 大小直接取自已读入的字节，UI 线程不再做 stat 系统调用
+                    size_kb = len(raw) / 1024
+
+                    # 判断文件类型
+                    if file_path.lower().endswith('.docx'):
+                        # 使用增强格式提取
+                        paragraphs_data = extract_docx_with_format(io.BytesIO(raw))
+                        text = "\n".join(paragraphs_data.texts)
+                        self._post_ui(lambda: self.on_file_loaded_with_format(text, file_path, size_kb, paragraphs_data, raw))
+                    else:
+                        # 普通文本提取（extract_file_text 按 name 判断格式）
+                        buffer = io.BytesIO(raw)
+                        buffer.name = file_path
+                        text = extract_file_text(buffer)
+                        self._post_ui(lambda: self.on_file_loaded(text, file_path, size_kb, raw))
                 except Exception as e:
-                    self.after(0, lambda: self.on_file_error(str(e)))
+                    self._post_ui(lambda: self.on_file_error(str(e)))
 
-            threading.Thread(target=read_file, daemon=True).start()
+            self._worker.submit(read_file)
 
         except Exception as e:
             self.on_file_error(str(e))
 
-    def on_file_loaded(self, text, file_path):
+    def on_file_loaded(self, text, file_path, size_kb, raw=None):
         """文件加载完成回调（纯文本模式）"""
         self.current_text = text
         self.current_file = file_path
+        self.current_file_bytes = raw
+        self.current_basename = os.path.basename(file_path)
+        self.current_stem = os.path.splitext(self.current_basename)[0]
         self.current_paragraphs = None
 
-        # 更新文件信息显示
-        file_size = os.path.getsize(file_path) / 1024  # KB
+        # 更新文件信息显示（大小由后台线程算好传入）
         self.file_info_label.configure(
-            text=f"✅ {os.path.basename(file_path)} ({file_size:.1f} KB)",
+            text=f"✅ {self.current_basename} ({size_kb:.1f} KB)",
             text_color="#34d399"
         )
 
@@ -590,16 +654,18 @@ class MaskingApp(ctk.CTk):
             text_color="#34d399"
         )
 
-    def on_file_loaded_with_format(self, text, file_path, paragraphs_data):
+    def on_file_loaded_with_format(self, text, file_path, size_kb, paragraphs_data, raw=None):
         """文件加载完成回调（增强格式模式）"""
         self.current_text = text
         self.current_file = file_path
+        self.current_file_bytes = raw
+        self.current_basename = os.path.basename(file_path)
+        self.current_stem = os.path.splitext(self.current_basename)[0]
         self.current_paragraphs = paragraphs_data
 
-        # 更新文件信息显示
-        file_size = os.path.getsize(file_path) / 1024  # KB
+        # 更新文件信息显示（大小由后台线程算好传入）
         self.file_info_label.configure(
-            text=f"✅ {os.path.basename(file_path)} ({file_size:.1f} KB)",
+            text=f"✅ {self.current_basename} ({size_kb:.1f} KB)",
             text_color="#34d399"
         )
 
@@ -673,6 +739,28 @@ class MaskingApp(ctk.CTk):
         if hasattr(self, 'preserve_value_label'):
             self.preserve_value_label.configure(text=str(int(value)))
 
+    def _post_ui(self, fn):
+        """从工作线程投递要在主线程执行的回调"""
+        self._ui_queue.put(fn)
+
+    def _post_progress(self, value):
+        """从工作线程提交进度值；主线程泵每拍只刷最近一次"""
+        self._pending_progress = value
+
+    def _drain_ui(self):
+        """主线程 UI 泵：批量执行投递的回调，再刷新进度条"""
+        while True:
+            try:
+                fn = self._ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            fn()
+        value = self._pending_progress
+        if value is not None:
+            self._pending_progress = None
+            self.progress_bar.set(value)
+        self.after(30, self._drain_ui)
+
     def on_mask_button_click(self):
         """处理脱敏按钮点击"""
         if self.processing:
@@ -711,7 +799,7 @@ class MaskingApp(ctk.CTk):
         def process_masking():
             try:
                 # 更新进度
-                self.after(0, lambda: self.progress_bar.set(0.2))
+                self._post_progress(0.2)
 
                 # 检查是否使用 OOXML 深度处理
                 use_ooxml_processing = (
@@ -722,59 +810,55 @@ class MaskingApp(ctk.CTk):
 
                 if use_ooxml_processing:
                     # 使用 OOXML 深度处理（直接在 Word 文档结构上操作）
-                    self.after(0, lambda: self.progress_bar.set(0.3))
-
-                    # 构建 mask_patterns（从智能识别模式构建）
-                    mask_patterns = {}
-                    if self.smart_detect.get():
-                        from core.masking import PREDEFINED_PATTERNS
-                        for name, pattern in PREDEFINED_PATTERNS.items():
-                            mask_patterns[name] = pattern.pattern
-
-                    # 应用 OOXML 级别的脱敏
-                    import io
-                    with open(self.current_file, 'rb') as f:
-                        file_content = io.BytesIO(f.read())
-                        file_content.seek(0)
-                        masked_docx = apply_ooxml_masking(
-                            file_content,
-                            keywords,
-                            mask_patterns,
-                            preserve_suffix=True
-                        )
+                    self._post_progress(0.3)
 
-                    self.after(0, lambda: self.progress_bar.set(0.6))
-
-                    # 为了统计和预览，仍需提取文本
-                    from core.file_handler import load_docx_text
-                    masked_io = io.BytesIO(masked_docx)
-                    masked = load_docx_text(masked_io)
-
-                    # 计算统计信息（简化版）
-                    stats = {
-                        "manual_keywords": len(keywords),
-                        "smart_detection": {}
-                    }
-                    if self.smart_detect.get():
-                        # 这里可以添加更精确的统计逻辑
-                        stats["smart_detection"] = {
-                            "手机号": masked.count("█") // 11,
-                            "其他": "已处理"
-                        }
+                    # mask_patterns 在启动时已构建好（被调方只读不改）
+                    mask_patterns = (
+                        self._predef_mask_patterns if self.smart_detect.get() else {}
+                    )
+
+                    # 应用 OOXML 级别的脱敏（复用加载时读入的字节，不再碰磁盘）
+                    if self.current_file_bytes is not None:
+                        file_content = io.BytesIO(self.current_file_bytes)
+                    else:
+                        with open(self.current_file, 'rb') as f:
+                            file_content = io.BytesIO(f.read())
+                    # 预览文本由脱敏过程顺带产出，无需再解析生成的 DOCX
+                    masked_docx, stats, masked = apply_ooxml_masking(
+                        file_content,
+                        keywords,
+                        mask_patterns,
+                        preserve_suffix=True
+                    )
+
+                    self._post_progress(0.6)
 
                     # 加密原文
                     encrypted = encrypt_text(self.current_text, password, keywords)
-                    encrypted_dict = asdict(encrypted)
-                    encrypted_dict['created_at'] = datetime.now().isoformat(timespec="seconds")
+                    encrypted.created_at = datetime.now().isoformat(timespec="seconds")
+                    # 二进制容器比 base64+JSON 小约 1/3，打包和解密都更快
+                    encrypted_blob = pack_result(encrypted)
 
-                    self.after(0, lambda: self.progress_bar.set(0.9))
+                    self._post_progress(0.9)
 
                     # 生成文件名（使用原始文件名+脱敏文件）
-                    original_filename = os.path.splitext(os.path.basename(self.current_file))[0]
-                    stamp = f"{original_filename}_脱敏文件"
-                    bundle_bytes = build_zip_bundle(masked_docx, encrypted_dict, stamp)
+                    stamp = f"{self.current_stem}_脱敏文件"
 
                 else:
+                    # 大文本先对开头 50KB 单独脱敏出一版预览并立即上屏，
+                    # 用户不必等全文处理完；完整结果出来后会覆盖它
+                    if len(self.current_text) > 50_000:
+                        early_masked, _ = build_masked_text(
+                            self.current_text[:50_000],
+                            keywords,
+                            self.mask_mode,
+                            self.preserve_chars,
+                            '*',
+                            self.smart_detect.get()
+                        )
+                        early_preview = early_masked[:500] + "..."
+                        self._post_ui(lambda: self.show_early_preview(early_preview))
+
                     # 使用原有的文本处理流程
                     # 执行脱敏
                     masked, stats = build_masked_text(
@@ -786,18 +870,18 @@ class MaskingApp(ctk.CTk):
                         self.smart_detect.get()
                     )
 
-                    self.after(0, lambda: self.progress_bar.set(0.5))
+                    self._post_progress(0.5)
 
                     # 加密原文
                     encrypted = encrypt_text(self.current_text, password, keywords)
-                    encrypted_dict = asdict(encrypted)
-                    encrypted_dict['created_at'] = datetime.now().isoformat(timespec="seconds")
+                    encrypted.created_at = datetime.now().isoformat(timespec="seconds")
+                    # 二进制容器比 base64+JSON 小约 1/3，打包和解密都更快
+                    encrypted_blob = pack_result(encrypted)
 
-                    self.after(0, lambda: self.progress_bar.set(0.8))
+                    self._post_progress(0.8)
 
                     # 生成文件名（使用原始文件名+脱敏文件）
-                    original_filename = os.path.splitext(os.path.basename(self.current_file))[0]
-                    stamp = f"{original_filename}_脱敏文件"
+                    stamp = f"{self.current_stem}_脱敏文件"
 
                     # 使用增强格式生成文档（如果可用）
                     if self.current_paragraphs and self.use_enhanced_format:
@@ -808,24 +892,33 @@ class MaskingApp(ctk.CTk):
                         # 使用普通方式生成文档
                         masked_docx = build_docx_bytes(masked)
 
-                    bundle_bytes = build_zip_bundle(masked_docx, encrypted_dict, stamp)
+                self._post_progress(1.0)
 
-                self.after(0, lambda: self.progress_bar.set(1.0))
+                # 预览在工作线程先切好，整段脱敏文本不随闭包驻留内存
+                preview = masked[:500] + "..." if len(masked) > 500 else masked
+                masked = None
 
-                # 完成回调
-                self.after(0, lambda: self.on_masking_complete(
-                    masked, stats, bundle_bytes, stamp
+                # 完成回调：只传引用，zip 等用户选好保存路径后直接写盘
+                self._post_ui(lambda: self.on_masking_complete(
+                    preview, stats, (masked_docx, encrypted_blob, stamp), stamp
                 ))
 
             except Exception as e:
-                self.after(0, lambda: self.on_masking_error(str(e)))
+                self._post_ui(lambda: self.on_masking_error(str(e)))
 
-        threading.Thread(target=process_masking, daemon=True).start()
+        self._worker.submit(process_masking)
 
-    def on_masking_complete(self, masked, stats, bundle_bytes, stamp):
-        """脱敏完成回调"""
+    def show_early_preview(self, preview_text):
+        """先行展示基于文本开头的预览，完整结果出来后会覆盖"""
+        self.result_preview.configure(state="normal")
+        self.result_preview.delete("1.0", "end")
+        self.result_preview.insert("1.0", preview_text)
+        self.result_preview.configure(state="disabled")
+
+    def on_masking_complete(self, preview_text, stats, bundle_source, stamp):
+        """脱敏完成回调（preview_text 已在工作线程截断好）"""
         self.processing = False
-        self.bundle_bytes = bundle_bytes
+        self._bundle_source = bundle_source
         self.current_stamp = stamp
 
         self.mask_button.configure(state="normal", text="🚀 开始脱敏")
@@ -837,24 +930,11 @@ class MaskingApp(ctk.CTk):
         # 更新结果展示
         self.result_preview.configure(state="normal")
         self.result_preview.delete("1.0", "end")
-        preview_text = masked[:500] + "..." if len(masked) > 500 else masked
         self.result_preview.insert("1.0", preview_text)
         self.result_preview.configure(state="disabled")
 
         # 更新统计
-        manual_count = stats.get("manual_keywords", 0)
-        self.stat_labels["keywords"].configure(text=str(manual_count))
-
-        smart_stats = stats.get("smart_detection", {})
-        self.stat_labels["phone"].configure(text=str(smart_stats.get("手机号", 0)))
-        self.stat_labels["idcard"].configure(text=str(smart_stats.get("身份证号", 0)))
-        self.stat_labels["email"].configure(text=str(smart_stats.get("邮箱", 0)))
-        self.stat_labels["credit_code"].configure(text=str(smart_stats.get("统一社会信用代码", 0)))
-        self.stat_labels["company"].configure(text=str(smart_stats.get("企业名称", 0)))
-        self.stat_labels["address"].configure(text=str(smart_stats.get("详细地址", 0)))
-        self.stat_labels["bank_card"].configure(text=str(smart_stats.get("银行卡号", 0)))
-        self.stat_labels["license_plate"].configure(text=str(smart_stats.get("车牌号", 0)))
-        self.stat_labels["amount"].configure(text=str(smart_stats.get("金额", 0)))
+        self.update_stat_cards(stats)
 
         # 启用下载按钮
         self.download_button.configure(state="normal")
@@ -872,7 +952,7 @@ class MaskingApp(ctk.CTk):
 
     def on_download_click(self):
         """处理下载按钮点击"""
-        if not self.bundle_bytes:
+        if not self._bundle_source:
             return
 
         file_path = filedialog.asksaveasfilename(
@@ -887,8 +967,9 @@ class MaskingApp(ctk.CTk):
 
         if file_path:
             try:
+                # zip 边压边写到目标文件，不在内存里先攒出完整包
                 with open(file_path, 'wb') as f:
-                    f.write(self.bundle_bytes)
+                    build_zip_bundle_into(f, *self._bundle_source)
                 CTkMessagebox.show_success(
                     self, "保存成功", "脱敏包已保存成功！"
                 )
@@ -900,7 +981,7 @@ class MaskingApp(ctk.CTk):
         file_path = filedialog.askopenfilename(
             title="选择加密还原文件",
             filetypes=[
-                ("JSON文件", "*.json"),
+                ("还原文件", "*.bin *.json"),
                 ("所有文件", "*.*")
             ]
         )
@@ -933,11 +1014,14 @@ class MaskingApp(ctk.CTk):
         # 在后台线程解密
         def process_restore():
             try:
-                import json
-
-                # 读取JSON文件
-                with open(self.restore_file_path, 'r', encoding='utf-8') as f:
-                    payload = json.load(f)
+                # 新版为二进制容器（.bin），旧版为 JSON
+                if self.restore_file_path.lower().endswith('.bin'):
+                    with open(self.restore_file_path, 'rb') as f:
+                        payload = f.read()
+                else:
+                    with open(self.restore_file_path, 'rb') as f:
+                        raw = f.read()
+                    payload = orjson.loads(raw) if orjson is not None else json.loads(raw)
 
                 # 解密
                 plain = decrypt_text(payload, password)
@@ -959,8 +1043,12 @@ class MaskingApp(ctk.CTk):
                     )
                     if file_path:
                         try:
-                            with open(file_path, 'wb') as f:
-                                f.write(restored_docx)
+                            # 1MB 分块写盘：memoryview 切片不复制底层字节，
+                            # 大文档不会因单次 write 长时间占住主线程
+                            view = memoryview(restored_docx)
+                            with open(file_path, 'wb', buffering=1 << 20) as f:
+                                for offset in range(0, len(view), 1 << 20):
+                                    f.write(view[offset:offset + (1 << 20)])
 
                             self.restore_button.configure(state="normal", text="🔓 解密并下载原文")
                             self.restore_status.configure(
@@ -975,14 +1063,14 @@ class MaskingApp(ctk.CTk):
                         self.restore_button.configure(state="normal", text="🔓 解密并下载原文")
                         self.restore_status.configure(text="已取消", text_color="gray")
 
-                self.after(0, save_file)
+                self._post_ui(save_file)
 
             except ValueError as e:
-                self.after(0, lambda: self.on_restore_error(str(e)))
+                self._post_ui(lambda: self.on_restore_error(str(e)))
             except Exception as e:
-                self.after(0, lambda: self.on_restore_error(str(e)))
+                self._post_ui(lambda: self.on_restore_error(str(e)))
 
-        threading.Thread(target=process_restore, daemon=True).start()
+        self._worker.submit(process_restore)
 
     def on_restore_error(self, error_msg):
         """还原错误回调"""
@@ -0,0 +1,17 @@
+"""
+pytest 共享夹具
+"""
+
+import pytest
+
+from app import derive_key
+
+
+@pytest.fixture(scope="session")
+def cached_key():
+    """会话级缓存的派生密钥
+
+    PBKDF2 故意设计得慢，每个用例都重新派生会让套件耗时被
+    KDF 而非被测代码主导；固定 (密码, 盐值) 的密钥整个会话算一次。
+    """
+    return derive_key("test_password", b"test_salt_16byte")
@@ -138,15 +138,14 @@ class TestEncryption:
 class TestKeyDerivation:
     """测试密钥派生功能"""
 
-    def test_same_password_same_salt_same_key(self):
+    def test_same_password_same_salt_same_key(self, cached_key):
         """测试相同密码和盐值产生相同密钥"""
         password = "test_password"
         salt = b"test_salt_16byte"
 
-        key1 = derive_key(password, salt)
-        key2 = derive_key(password, salt)
+        key = derive_key(password, salt)
 
-        assert key1 == key2
+        assert key == cached_key
 
     def test_different_passwords_different_keys(self):
         """测试不同密码产生不同密钥"""
@@ -166,15 +165,10 @@ class TestKeyDerivation:
 
         assert key1 != key2
 
-    def test_key_length(self):
+    def test_key_length(self, cached_key):
         """测试密钥长度"""
-        password = "test_password"
-        salt = b"test_salt_16byte"
-
-        key = derive_key(password, salt)
-
         # 应该是32字节（256位）
-        assert len(key) == 32
+        assert len(cached_key) == 32
 
 
 class TestEncryptionIntegration:
@@ -226,5 +220,202 @@ class TestEncryptionIntegration:
         assert decrypted == text
 
 
+class TestBinaryContainer:
+    """测试二进制还原容器（LDAR 格式）"""
+
+    def test_serialize_roundtrip(self):
+        """测试序列化往返"""
+        from app import serialize_binary, deserialize_binary
+
+        text = "需要还原的原文"
+        password = "test_password"
+        encrypted = encrypt_text(text, password, ["关键词"])
+
+        blob = serialize_binary(encrypted.to_dict())
+        payload = deserialize_binary(blob)
+        decrypted = decrypt_text(payload, password)
+
+        assert decrypted == text
+        assert payload["masked_keywords"] == ["关键词"]
+
+    def test_magic_sniffing(self):
+        """测试格式标识嗅探：二进制容器与旧版 JSON 可区分"""
+        from app import serialize_binary, _PACK_MAGIC
+
+        encrypted = encrypt_text("测试", "pw", [])
+        blob = serialize_binary(encrypted.to_dict())
+        legacy = json.dumps(encrypted.to_dict()).encode("utf-8")
+
+        assert blob[:4] == _PACK_MAGIC
+        assert legacy[:4] != _PACK_MAGIC
+
+    def test_corrupted_input_rejected(self):
+        """测试损坏输入被拒绝"""
+        from app import serialize_binary, deserialize_binary
+
+        encrypted = encrypt_text("测试", "pw", [])
+        blob = serialize_binary(encrypted.to_dict())
+
+        bad_inputs = [
+            b"",                       # 空
+            b"LDA",                    # 标识不完整
+            b"XXXX" + blob[4:],        # 错误标识
+            blob[:10],                 # 头部截断
+            b"LDAR\xff\xff" + blob[6:],  # 不支持的版本
+        ]
+        for bad in bad_inputs:
+            with pytest.raises(ValueError):
+                deserialize_binary(bad)
+
+    def test_cross_format_with_core(self):
+        """测试与 core 端容器互通：两端产出的文件可互相还原"""
+        from app import serialize_binary, deserialize_binary
+        from core import encryption as core_enc
+
+        text = "跨端还原测试"
+        password = "test_password"
+
+        # Web 端产出 -> core 端还原
+        encrypted = encrypt_text(text, password, [])
+        blob = serialize_binary(encrypted.to_dict())
+        assert core_enc.decrypt_text(blob, password) == text
+
+        # core 端产出（scrypt）-> Web 端还原
+        core_result = core_enc.encrypt_text(text, password, [])
+        core_blob = core_enc.pack_result(core_result)
+        payload = deserialize_binary(core_blob)
+        assert decrypt_text(payload, password) == text
+
+
+class TestPackResult:
+    """测试 core 端 pack_result/unpack_result"""
+
+    def test_pack_unpack_roundtrip(self):
+        """测试打包解包往返"""
+        from core import encryption as core_enc
+        import base64
+
+        result = core_enc.encrypt_text("打包测试文本", "pw", ["词"])
+        blob = core_enc.pack_result(result)
+        meta, salt, nonce, data = core_enc.unpack_result(blob)
+
+        assert salt == base64.b64decode(result.salt)
+        assert nonce == base64.b64decode(result.nonce)
+        assert data == base64.b64decode(result.data)
+        assert meta["masked_keywords"] == ["词"]
+        assert meta["kdf"] == result.kdf
+        assert core_enc.decrypt_text(blob, "pw") == "打包测试文本"
+
+    def test_corrupted_input_rejected(self):
+        """测试损坏输入被拒绝"""
+        from core import encryption as core_enc
+
+        result = core_enc.encrypt_text("测试", "pw", [])
+        blob = core_enc.pack_result(result)
+
+        with pytest.raises(ValueError):
+            core_enc.unpack_result(b"XXXX" + blob[4:])
+        with pytest.raises(ValueError):
+            core_enc.unpack_result(b"LDAR\xff\xff" + blob[6:])
+
+
+class TestParallelContainer:
+    """测试分块并行加密容器"""
+
+    def test_roundtrip(self):
+        """测试分块加解密往返（多块 + 不满一块的尾部）"""
+        from core.encryption import encrypt_text_parallel, decrypt_text_parallel
+        import os
+
+        key = os.urandom(32)
+        base_nonce = os.urandom(12)
+        plaintext = os.urandom(10000)
+
+        blob = encrypt_text_parallel(plaintext, key, base_nonce, chunk_size=4096)
+        assert decrypt_text_parallel(blob, key, base_nonce) == plaintext
+
+    def test_empty_plaintext(self):
+        """测试空明文"""
+        from core.encryption import encrypt_text_parallel, decrypt_text_parallel
+        import os
+
+        key = os.urandom(32)
+        base_nonce = os.urandom(12)
+
+        blob = encrypt_text_parallel(b"", key, base_nonce)
+        assert decrypt_text_parallel(blob, key, base_nonce) == b""
+
+    def test_truncation_rejected(self):
+        """测试截断攻击被拒绝：块数与尾部字节都受校验"""
+        from core.encryption import encrypt_text_parallel, decrypt_text_parallel, _CHUNK_HEADER
+        import os
+
+        key = os.urandom(32)
+        base_nonce = os.urandom(12)
+        blob = encrypt_text_parallel(os.urandom(10000), key, base_nonce, chunk_size=4096)
+        chunk_count, chunk_size = _CHUNK_HEADER.unpack_from(blob)
+
+        # 砍掉最后一块并改小块数（静默截断）
+        body_end = _CHUNK_HEADER.size + (chunk_count - 1) * (chunk_size + 16)
+        forged = _CHUNK_HEADER.pack(chunk_count - 1, chunk_size) \
+            + blob[_CHUNK_HEADER.size:body_end]
+        with pytest.raises(ValueError):
+            decrypt_text_parallel(forged, key, base_nonce)
+
+        # 容器尾部附加多余字节
+        with pytest.raises(ValueError):
+            decrypt_text_parallel(blob + b"\x00", key, base_nonce)
+
+        # 直接截断
+        with pytest.raises(ValueError):
+            decrypt_text_parallel(blob[:-1], key, base_nonce)
+
+    def test_chunk_reorder_rejected(self):
+        """测试块顺序被篡改时解密失败"""
+        from core.encryption import encrypt_text_parallel, decrypt_text_parallel, _CHUNK_HEADER
+        import os
+
+        key = os.urandom(32)
+        base_nonce = os.urandom(12)
+        blob = encrypt_text_parallel(os.urandom(8192), key, base_nonce, chunk_size=4096)
+
+        offset = _CHUNK_HEADER.size
+        sealed_size = 4096 + 16
+        first = blob[offset:offset + sealed_size]
+        second = blob[offset + sealed_size:]
+        forged = blob[:offset] + second + first
+        with pytest.raises(ValueError):
+            decrypt_text_parallel(forged, key, base_nonce)
+
+
+class TestEncryptBatch:
+    """测试批量加密"""
+
+    def test_batch_roundtrip(self):
+        """测试批量加密的每个条目都能独立还原"""
+        from core import encryption as core_enc
+
+        items = ["第一段原文", "第二段原文", "第三段原文"]
+        password = "test_password"
+        results = core_enc.encrypt_batch(items, password, ["词"])
+
+        assert len(results) == len(items)
+        for text, result in zip(items, results):
+            blob = core_enc.pack_result(result)
+            assert core_enc.decrypt_text(blob, password) == text
+            assert result.original_length == len(text)
+            assert result.masked_keywords == ["词"]
+
+    def test_batch_shares_salt_unique_nonces(self):
+        """测试批量条目共享盐值但 Nonce 各不相同"""
+        from core import encryption as core_enc
+
+        results = core_enc.encrypt_batch(["甲", "乙", "丙"], "pw")
+
+        assert len({r.salt for r in results}) == 1
+        assert len({r.nonce for r in results}) == 3
+        assert len({r.data for r in results}) == 3
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,79 @@
+"""
+OOXML 脱敏处理单元测试
+"""
+
+import io
+
+import pytest
+from docx import Document
+
+from core.ooxml_processor import apply_ooxml_masking
+
+
+def _build_docx(paragraphs) -> io.BytesIO:
+    """用 python-docx 在内存中构造测试文档"""
+    document = Document()
+    for text in paragraphs:
+        document.add_paragraph(text)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class TestApplyOoxmlMasking:
+    """测试 apply_ooxml_masking 的 (字节, 统计, 预览) 契约"""
+
+    def test_keyword_masking_and_stats(self):
+        """测试关键词脱敏与统计结构"""
+        file_obj = _build_docx(["客户张三的合同", "张三已签字确认"])
+
+        masked_bytes, stats, preview = apply_ooxml_masking(
+            file_obj, ["张三"], {}, preserve_suffix=True
+        )
+
+        # 统计结构与 build_masked_text 一致
+        assert stats == {"manual_keywords": 1, "smart_detection": {}}
+
+        # 产出的字节是合法 DOCX 且关键词已被替换
+        masked_doc = Document(io.BytesIO(masked_bytes))
+        texts = [p.text for p in masked_doc.paragraphs]
+        assert all("张三" not in text for text in texts)
+        assert "█" in texts[0]
+
+    def test_smart_detection_stats(self):
+        """测试智能识别命中按类别累计"""
+        file_obj = _build_docx([
+            "联系电话 13812345678",
+            "备用电话 13987654321",
+        ])
+        patterns = {"手机号": r"1[3-9]\d{9}"}
+
+        masked_bytes, stats, preview = apply_ooxml_masking(
+            file_obj, [], patterns, preserve_suffix=True
+        )
+
+        assert stats["manual_keywords"] == 0
+        assert stats["smart_detection"] == {"手机号": 2}
+        assert "13812345678" not in preview
+
+    def test_preview_matches_masked_content(self):
+        """测试预览取自脱敏后的内容"""
+        file_obj = _build_docx(["客户张三的合同"])
+
+        _, _, preview = apply_ooxml_masking(file_obj, ["张三"], {})
+
+        assert "张三" not in preview
+        assert "合同" in preview
+
+    def test_preview_disabled(self):
+        """测试 preview_chars=0 时不生成预览"""
+        file_obj = _build_docx(["一些内容"])
+
+        _, _, preview = apply_ooxml_masking(file_obj, [], {}, preview_chars=0)
+
+        assert preview == ""
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])